@@ -0,0 +1,239 @@
+"""
+Load and latency benchmark for the REST API.
+
+Seeds a database with fake users and contacts, runs concurrent scenarios against the ASGI app
+in-process with httpx and reports RPS and p50/p95/p99 latency. Results can be saved as a JSON
+baseline and compared with it on the next run.
+
+Redis from .env is still required: it caches authenticated users.
+
+Usage:
+    python -m benchmarks.bench_api --contacts 10000 --save-baseline benchmarks/baseline.json
+    python -m benchmarks.bench_api --contacts 10000 --baseline benchmarks/baseline.json
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import statistics
+import sys
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+import httpx
+from faker import Faker
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+from main import app
+from src.config.settings import settings
+from src.models.db import get_db
+from src.models.models import Base, Contact, User
+from src.services.auth import auth_service
+
+
+SCENARIOS = ("login", "list", "search", "birthdays", "create")
+PASSWORD = "benchmark"
+
+
+def seed(session_factory, users: int, contacts: int) -> list[dict]:
+    """
+    Recreate tables and fill them with fake data
+
+    Args:
+        session_factory (sessionmaker): DB session factory
+        users (int): Number of users
+        contacts (int): Number of contacts per user
+
+    Returns:
+        list[dict]: Seeded users with email and last names of their contacts
+    """
+    fake = Faker()
+    Faker.seed(13)
+    engine = session_factory.kw["bind"]
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    password = auth_service.get_password_hash(PASSWORD)
+    seeded = []
+    with session_factory() as db:
+        for u in range(users):
+            user = User(username=f"bench{u}", email=f"bench{u}@example.com", password=password, confirmed=True)
+            db.add(user)
+            db.flush()
+            rows = []
+            for c in range(contacts):
+                rows.append({"first_name": fake.first_name(),
+                             "last_name": fake.last_name(),
+                             "email": f"c{u}-{c}@example.com",
+                             "phone": f"+1{u:04d}{c:07d}",
+                             "birthday": fake.date_of_birth(minimum_age=1, maximum_age=90),
+                             "notes": fake.text(200),
+                             "user_id": user.id})
+                if len(rows) == 5000:
+                    db.execute(insert(Contact), rows)
+                    rows = []
+            if rows:
+                db.execute(insert(Contact), rows)
+            seeded.append({"email": user.email, "surname": fake.last_name()})
+        db.commit()
+    return seeded
+
+
+def percentile(values: list[float], pct: float) -> float:
+    """
+    Nearest-rank percentile
+
+    Args:
+        values (list[float]): Sorted values
+        pct (float): Percentile, 0..100
+
+    Returns:
+        float: Percentile value
+    """
+    if not values:
+        return 0.0
+    rank = max(0, min(len(values) - 1, round(pct / 100 * len(values) + 0.5) - 1))
+    return values[rank]
+
+
+async def run_scenario(client: httpx.AsyncClient, name: str, users: list[dict], requests: int, concurrency: int) -> dict:
+    """
+    Run one scenario with the given concurrency
+
+    Args:
+        client (httpx.AsyncClient): Client bound to the ASGI app
+        name (str): Scenario name
+        users (list[dict]): Seeded users with access tokens
+        requests (int): Total number of requests
+        concurrency (int): Number of concurrent clients
+
+    Returns:
+        dict: rps, latency percentiles in milliseconds and number of errors
+    """
+    counter = itertools.count()
+    latencies = []
+    errors = 0
+
+    def build(i: int) -> tuple[str, str, dict]:
+        user = users[i % len(users)]
+        auth = {"headers": {"Authorization": f"Bearer {user['token']}"}}
+        if name == "login":
+            return "POST", "/auth/login", {"data": {"username": user["email"], "password": PASSWORD}}
+        if name == "list":
+            return "GET", "/api/contacts/", {"params": {"limit": 100}, **auth}
+        if name == "search":
+            return "GET", "/api/contacts/query", {"params": {"last_name": user["surname"]}, **auth}
+        if name == "birthdays":
+            return "GET", "/api/contacts/query/birtdays", {"params": {"days": 7}, **auth}
+        birthday = date(1990, 1, 1) + timedelta(days=i % 10000)
+        body = {"first_name": "Bench", "last_name": "Create", "email": f"new{time.time_ns()}-{i}@example.com",
+                "phone": f"+2{time.time_ns() % 10**12:012d}", "birthday": birthday.isoformat(), "notes": ""}
+        return "POST", "/api/contacts/", {"json": body, **auth}
+
+    async def worker():
+        nonlocal errors
+        while (i := next(counter)) < requests:
+            method, url, kwargs = build(i)
+            start = time.perf_counter()
+            response = await client.request(method, url, **kwargs)
+            latencies.append((time.perf_counter() - start) * 1000)
+            # 404 is a valid answer for searches with no matches
+            if response.status_code >= 400 and response.status_code != 404:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {"requests": requests,
+            "errors": errors,
+            "rps": round(requests / elapsed, 1),
+            "p50": round(percentile(latencies, 50), 2),
+            "p95": round(percentile(latencies, 95), 2),
+            "p99": round(percentile(latencies, 99), 2),
+            "mean": round(statistics.fmean(latencies), 2) if latencies else 0.0}
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    """
+    Compare results with the baseline
+
+    Args:
+        results (dict): Current results by scenario
+        baseline (dict): Baseline results by scenario
+        tolerance (float): Allowed relative degradation, i.e. 0.1 for 10%
+
+    Returns:
+        list[str]: Regressions found
+    """
+    regressions = []
+    for name, current in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        if current["rps"] < base["rps"] * (1 - tolerance):
+            regressions.append(f"{name}: rps {current['rps']} < baseline {base['rps']}")
+        for key in ("p95", "p99"):
+            if current[key] > base[key] * (1 + tolerance):
+                regressions.append(f"{name}: {key} {current[key]} ms > baseline {base[key]} ms")
+    return regressions
+
+
+async def main(args: argparse.Namespace) -> int:
+    engine = create_engine(args.db_url, connect_args={"check_same_thread": False} if args.db_url.startswith("sqlite") else {})
+    session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    def override_get_db():
+        db = session_factory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = override_get_db
+    settings.rate_limit_enabled = False
+
+    print(f"Seeding {args.users} users x {args.contacts} contacts into {args.db_url}")
+    users = seed(session_factory, args.users, args.contacts)
+    for user in users:
+        user["token"] = await auth_service.create_access_token(data={"sub": user["email"]}, expires_delta=3600)
+
+    results = {}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for name in args.scenarios:
+            requests = args.login_requests if name == "login" else args.requests
+            results[name] = await run_scenario(client, name, users, requests, args.concurrency)
+            r = results[name]
+            print(f"{name:<10} {r['rps']:>9} rps  p50 {r['p50']:>8} ms  p95 {r['p95']:>8} ms  "
+                  f"p99 {r['p99']:>8} ms  errors {r['errors']}")
+
+    if args.save_baseline:
+        Path(args.save_baseline).write_text(json.dumps(results, indent=2))
+        print(f"Baseline saved to {args.save_baseline}")
+    if args.baseline:
+        regressions = compare(results, json.loads(Path(args.baseline).read_text()), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        return 1 if regressions else 0
+    return 0
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db-url", default="sqlite:///./bench.db", help="Database to seed, it is recreated")
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--contacts", type=int, default=1000, help="Contacts per user")
+    parser.add_argument("--requests", type=int, default=500, help="Requests per scenario")
+    parser.add_argument("--login-requests", type=int, default=50, help="Requests for login scenario, bcrypt is slow")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--baseline", help="JSON baseline to compare with, exit code 1 on regression")
+    parser.add_argument("--save-baseline", help="Save results as JSON baseline")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="Allowed relative degradation")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main(parse_args())))
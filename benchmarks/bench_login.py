@@ -0,0 +1,66 @@
+"""
+Login throughput benchmark of one worker process.
+
+Runs concurrent logins against the ASGI app in-process and reports logins/second, latency percentiles
+and SQL statements per login, with refresh token rotations written one by one and in batches.
+bcrypt runs in the thread pool, so throughput grows with concurrency up to the number of cores.
+
+Redis from .env is still required by the app.
+
+Usage:
+    python -m benchmarks.bench_login --users 20 --requests 200 --concurrency 8
+"""
+import argparse
+import asyncio
+import sys
+
+import httpx
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from benchmarks.bench_api import seed, run_scenario
+from main import app
+from src.config.settings import settings
+from src.models.db import get_db
+from src.services.sqldebug import count_statements
+from src.services.users import token_writer
+
+
+async def main(args: argparse.Namespace) -> int:
+    engine = create_engine(args.db_url, connect_args={"check_same_thread": False} if args.db_url.startswith("sqlite") else {})
+    session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    def override_get_db():
+        db = session_factory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = override_get_db
+    settings.rate_limit_enabled = False
+    users = [{**user, "token": ""} for user in seed(session_factory, args.users, 0)]
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for batch in (False, True):
+            settings.auth_token_batch = batch
+            with count_statements(engine) as log:
+                r = await run_scenario(client, "login", users, args.requests, args.concurrency)
+                await token_writer.flush()
+            print(f"{'batched' if batch else 'direct':<8} {r['rps']:>8} logins/s  p50 {r['p50']:>8} ms  "
+                  f"p95 {r['p95']:>8} ms  statements/login {len(log) / args.requests:.2f}  errors {r['errors']}")
+    return 0
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db-url", default="sqlite:///./bench.db", help="Database to seed, it is recreated")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main(parse_args())))
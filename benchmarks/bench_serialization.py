@@ -0,0 +1,97 @@
+"""
+Micro-benchmark of list response serialization.
+
+Compares, on pages of contacts read from an in-memory SQLite database:
+  validated - ORM entities validated through a response model that inherits input validators
+              (EmailStr, length checks), dumped to python and encoded by json.dumps,
+              the way FastAPI renders `response_model` results
+  lean      - rows of selected columns, models built without validation and dumped by pydantic-core
+              (src.services.serialization.rows_json)
+
+Usage:
+    python -m benchmarks.bench_serialization --rows 100 --number 200
+"""
+import argparse
+import json
+import sys
+import timeit
+from datetime import date, timedelta
+from typing import Optional
+
+from pydantic import BaseModel, TypeAdapter
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+from src.models.models import Base, Contact
+from src.models.schemas import ContactModel, ContactResponse
+from src.services.contacts import READ_COLUMNS
+from src.services.serialization import rows_json
+
+
+class ValidatedContactResponse(ContactModel):
+    """
+    Previous response schema: inherits ContactModel validators
+    """
+    id:         int
+    notes:      Optional[str] = None
+
+    class Config:
+        from_attributes = True
+
+
+def seed(rows: int) -> sessionmaker:
+    """
+    Create in-memory database with `rows` contacts
+
+    Args:
+        rows (int): Number of contacts
+
+    Returns:
+        sessionmaker: DB session factory
+    """
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    session_factory = sessionmaker(bind=engine)
+    with session_factory() as db:
+        db.execute(insert(Contact), [{"first_name": f"Name{i}", "last_name": f"Surname{i}",
+                                      "email": f"contact{i}@example.com", "phone": f"+380500{i:07d}",
+                                      "birthday": date(1970, 1, 1) + timedelta(days=i * 37),
+                                      "notes": "note " * 20, "user_id": 1} for i in range(rows)])
+        db.commit()
+    return session_factory
+
+
+def main(args: argparse.Namespace) -> int:
+    session_factory = seed(args.rows)
+    validated = TypeAdapter(list[ValidatedContactResponse])
+
+    def validated_page():
+        with session_factory() as db:
+            contacts = db.query(Contact).limit(args.rows).all()
+            payload = validated.dump_python(validated.validate_python(contacts, from_attributes=True), mode="json")
+            return json.dumps(payload).encode()
+
+    def lean_page():
+        with session_factory() as db:
+            return rows_json(db.query(*READ_COLUMNS).limit(args.rows).all(), ContactResponse)
+
+    assert json.loads(validated_page()) == json.loads(lean_page())
+    results = {}
+    for name, func in (("validated", validated_page), ("lean", lean_page)):
+        best = min(timeit.repeat(func, number=args.number, repeat=args.repeat)) / args.number
+        results[name] = best * 1e6
+        print(f"{name:10} {results[name]:10.1f} us/page")
+    print(f"{'speedup':10} {results['validated'] / results['lean']:10.2f}x")
+    return 0
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100, help="Contacts per page")
+    parser.add_argument("--number", type=int, default=200, help="Pages per timing")
+    parser.add_argument("--repeat", type=int, default=5)
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    sys.exit(main(parse_args()))
@@ -1,24 +1,40 @@
 import uvicorn
-import redis.asyncio as redis
 
 from contextlib import asynccontextmanager
-from fastapi import FastAPI
-from fastapi_limiter import FastAPILimiter
+from fastapi import Depends, FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
-from src.routes import contacts, auth, user
+from src.routes import contacts, auth, user, jwks, metrics, health
 from src.config.settings import settings
+from src.services.caching import CachePolicy, CacheControlMiddleware
+from src.services.idempotency import IdempotencyMiddleware
+from src.services.metrics import MetricsMiddleware
+from src.services.resources import resources
+from src.services.stats import reconcile_stats
+from src.services.contacts import purge_tombstones
+from src.services.dedup import auto_merge
+from src.services.users import purge_unconfirmed
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     '''
-    Rate limit for FastAPI. New scheme instead of deprecated "on_event" 
+    Open and warm per-worker resources (DB, Redis, rate limiter, SMTP check) on startup,
+    drain background tasks and close them on shutdown.
+    New scheme instead of deprecated "on_event" 
     : param app : FastAPI application name
     : type app : FastAPI
     '''
-    r = await redis.Redis(host=settings.redis_host, port=settings.redis_port, db=0, encoding="utf-8", decode_responses=True)
-    await FastAPILimiter.init(r)
+    if settings.stats_reconcile_seconds:
+        resources.periodic("reconcile_stats", settings.stats_reconcile_seconds, reconcile_stats)
+    if settings.contacts_purge_seconds:
+        resources.periodic("purge_tombstones", settings.contacts_purge_seconds, purge_tombstones)
+    if settings.dedup_auto_merge_seconds:
+        resources.periodic("auto_merge", settings.dedup_auto_merge_seconds, auto_merge)
+    if settings.users_purge_seconds:
+        resources.periodic("purge_unconfirmed", settings.users_purge_seconds, purge_unconfirmed)
+    await resources.open()
     yield
+    await resources.close()
 
 
 app = FastAPI(lifespan=lifespan)
@@ -26,6 +42,16 @@ app = FastAPI(lifespan=lifespan)
 app.include_router(contacts.router, prefix='/api')
 app.include_router(auth.router, prefix='/auth')
 app.include_router(user.router, prefix='/user')
+app.include_router(jwks.router)
+app.include_router(health.router)
+if settings.metrics_enabled:
+    app.include_router(metrics.router)
+
+# inside CORS, so replayed responses get CORS headers too
+if settings.idempotency_enabled:
+    app.add_middleware(IdempotencyMiddleware)
+if settings.cache_headers_enabled:
+    app.add_middleware(CacheControlMiddleware)
 
 cors_origins = [ 
     "*"
@@ -39,6 +65,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+if settings.metrics_enabled or settings.sql_debug:
+    app.add_middleware(MetricsMiddleware)
+
 # deprecated
 # @app.on_event("startup")
 # async def startup() -> None:
@@ -46,7 +75,7 @@ app.add_middleware(
 #     await FastAPILimiter.init(r)
 
 
-@app.get("/")
+@app.get("/", dependencies=[Depends(CachePolicy("root"))])
 def read_root() -> dict:
     '''
     Dummy URL for request without path and parameters
@@ -55,4 +84,14 @@ def read_root() -> dict:
 
 
 if __name__ == "__main__":
-    uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
+    uvicorn.run("main:app",
+                host=settings.server_host,
+                port=settings.server_port,
+                workers=settings.server_workers,
+                reload=settings.server_reload,
+                loop=settings.server_loop,
+                http=settings.server_http,
+                timeout_keep_alive=settings.server_keep_alive,
+                timeout_graceful_shutdown=settings.server_graceful_timeout,
+                proxy_headers=True,
+                forwarded_allow_ips=settings.server_forwarded_allow_ips)
@@ -0,0 +1,37 @@
+"""lower lookup indexes
+
+Revision ID: 3f1c2a7d9e04
+Revises: 9cb418ae4071
+Create Date: 2026-10-19 10:12:41.215307
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f1c2a7d9e04'
+down_revision: Union[str, None] = '9cb418ae4071'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # emails are stored lowercased from now on, names are stored as typed.
+    # contacts.email is still globally unique here: contacts whose emails differ only by case are kept
+    # as typed instead of failing the upgrade, the dedup job suggests merging them
+    op.execute("UPDATE contacts SET email = lower(email) WHERE email <> lower(email) "
+               "AND NOT EXISTS (SELECT 1 FROM contacts other "
+               "WHERE other.id <> contacts.id AND lower(other.email) = lower(contacts.email))")
+    op.create_index('ix_contacts_name_lower', 'contacts', [sa.text('lower(name)')])
+    op.create_index('ix_contacts_surname_lower', 'contacts', [sa.text('lower(surname)')])
+    # fails if two accounts differ only by email case - merge them before upgrading
+    op.create_index('uq_users_email_lower', 'users', [sa.text('lower(email)')], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index('uq_users_email_lower', table_name='users')
+    op.drop_index('ix_contacts_surname_lower', table_name='contacts')
+    op.drop_index('ix_contacts_name_lower', table_name='contacts')
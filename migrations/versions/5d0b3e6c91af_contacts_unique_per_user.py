@@ -0,0 +1,38 @@
+"""contacts unique per user
+
+Revision ID: 5d0b3e6c91af
+Revises: c4a9e7f2b810
+Create Date: 2026-10-19 16:02:44.719305
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5d0b3e6c91af'
+down_revision: Union[str, None] = 'c4a9e7f2b810'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # the same person may be a contact of several users
+    op.create_index('uq_contacts_user_email_active', 'contacts', ['user_id', 'email'], unique=True,
+                    postgresql_where=sa.text('deleted_at IS NULL'))
+    op.create_index('uq_contacts_user_phone_active', 'contacts', ['user_id', 'phone'], unique=True,
+                    postgresql_where=sa.text('deleted_at IS NULL'))
+    op.drop_index('uq_contacts_email_active', table_name='contacts')
+    op.drop_index('uq_contacts_phone_active', table_name='contacts')
+
+
+def downgrade() -> None:
+    # fails if several users have the same contact - remove them before downgrading
+    op.create_index('uq_contacts_email_active', 'contacts', ['email'], unique=True,
+                    postgresql_where=sa.text('deleted_at IS NULL'))
+    op.create_index('uq_contacts_phone_active', 'contacts', ['phone'], unique=True,
+                    postgresql_where=sa.text('deleted_at IS NULL'))
+    op.drop_index('uq_contacts_user_phone_active', table_name='contacts')
+    op.drop_index('uq_contacts_user_email_active', table_name='contacts')
@@ -0,0 +1,28 @@
+"""contacts created_at
+
+Revision ID: 8b2e5d41c7a3
+Revises: 3f1c2a7d9e04
+Create Date: 2026-10-19 11:03:27.518842
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8b2e5d41c7a3'
+down_revision: Union[str, None] = '3f1c2a7d9e04'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('contacts', sa.Column('created_at', sa.DateTime(), server_default=sa.func.now(), nullable=True))
+    op.create_index('ix_contacts_user_created', 'contacts', ['user_id', 'created_at'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_contacts_user_created', table_name='contacts')
+    op.drop_column('contacts', 'created_at')
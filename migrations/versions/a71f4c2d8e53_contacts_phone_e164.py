@@ -0,0 +1,58 @@
+"""contacts phone_e164
+
+Revision ID: a71f4c2d8e53
+Revises: 5d0b3e6c91af
+Create Date: 2026-10-19 17:15:09.604281
+
+"""
+from typing import Sequence, Union
+
+from alembic import context, op
+import phonenumbers
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a71f4c2d8e53'
+down_revision: Union[str, None] = '5d0b3e6c91af'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH = 1000
+# country of numbers typed without country code, `alembic -x phone_region=XX upgrade head` to change
+REGION = "UA"
+
+
+def normalize_phone(phone: str, region: str) -> str | None:
+    """
+    E.164 number as src.services.normalize.normalize_phone formatted it at this revision
+    """
+    try:
+        number = phonenumbers.parse(phone, region)
+    except phonenumbers.NumberParseException:
+        return None
+    if not phonenumbers.is_possible_number(number):
+        return None
+    return phonenumbers.format_number(number, phonenumbers.PhoneNumberFormat.E164)
+
+
+def upgrade() -> None:
+    op.add_column('contacts', sa.Column('phone_e164', sa.String(length=16), nullable=True))
+    # E.164 formatting needs the phonenumbers library, existing rows are normalized in batches
+    region = context.get_x_argument(as_dictionary=True).get("phone_region", REGION)
+    connection = op.get_bind()
+    last_id = 0
+    while True:
+        rows = connection.execute(sa.text("SELECT id, phone FROM contacts WHERE id > :last_id ORDER BY id LIMIT :batch"),
+                                  {"last_id": last_id, "batch": BATCH}).all()
+        if not rows:
+            break
+        numbers = [{"id": row.id, "number": normalize_phone(row.phone, region)} for row in rows]
+        connection.execute(sa.text("UPDATE contacts SET phone_e164 = :number WHERE id = :id"), numbers)
+        last_id = rows[-1].id
+    op.create_index('ix_contacts_user_phone_e164', 'contacts', ['user_id', 'phone_e164'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_contacts_user_phone_e164', table_name='contacts')
+    op.drop_column('contacts', 'phone_e164')
@@ -0,0 +1,84 @@
+"""contacts hash partitions
+
+Revision ID: b6e0d3a9c152
+Revises: e29b6a0f4d17
+Create Date: 2026-10-19 19:32:47.118402
+
+"""
+from typing import Sequence, Union
+
+from alembic import context, op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b6e0d3a9c152'
+down_revision: Union[str, None] = 'e29b6a0f4d17'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# hash partitions by user, `alembic -x partitions=N upgrade head` to change, 0 - keep the single table
+PARTITIONS = 16
+
+# same names as in src/models/models.py, partitioned indexes are created on every partition
+INDEXES = [
+    "CREATE INDEX ix_contacts_name_lower ON contacts (lower(name))",
+    "CREATE INDEX ix_contacts_surname_lower ON contacts (lower(surname))",
+    "CREATE INDEX ix_contacts_user_created ON contacts (user_id, created_at)",
+    "CREATE INDEX ix_contacts_user_phone_e164 ON contacts (user_id, phone_e164)",
+    "CREATE INDEX ix_contacts_user_changes ON contacts (user_id, updated_at, id)",
+    "CREATE UNIQUE INDEX uq_contacts_user_email_active ON contacts (user_id, email) WHERE deleted_at IS NULL",
+    "CREATE UNIQUE INDEX uq_contacts_user_phone_active ON contacts (user_id, phone) WHERE deleted_at IS NULL",
+]
+
+
+def _rebuild(partitions: int) -> None:
+    """
+    Copy contacts to a new table, hash-partitioned by user_id if partitions > 0, and swap it in.
+    The table is locked for the copy, run it in a maintenance window.
+    """
+    columns = ("id, name, surname, email, phone, phone_e164, birthday, notes, user_id, "
+               "created_at, updated_at, deleted_at")
+    # the id sequence must survive dropping the old table
+    op.execute("ALTER SEQUENCE contacts_id_seq OWNED BY NONE")
+    if partitions:
+        op.execute("CREATE TABLE contacts_new (LIKE contacts INCLUDING DEFAULTS) PARTITION BY HASH (user_id)")
+        for remainder in range(partitions):
+            op.execute(f"CREATE TABLE contacts_p{remainder} PARTITION OF contacts_new "
+                       f"FOR VALUES WITH (MODULUS {partitions}, REMAINDER {remainder})")
+        # primary key of a partitioned table must include the partition key, contacts without owner
+        # were never returned by any query and are not copied
+        op.execute("ALTER TABLE contacts_new ALTER COLUMN user_id SET NOT NULL")
+        op.execute(f"INSERT INTO contacts_new ({columns}) SELECT {columns} FROM contacts WHERE user_id IS NOT NULL")
+        primary_key = "id, user_id"
+    else:
+        op.execute("CREATE TABLE contacts_new (LIKE contacts INCLUDING DEFAULTS)")
+        op.execute("ALTER TABLE contacts_new ALTER COLUMN user_id DROP NOT NULL")
+        op.execute(f"INSERT INTO contacts_new ({columns}) SELECT {columns} FROM contacts")
+        primary_key = "id"
+    op.execute("DROP TABLE contacts")
+    op.execute("ALTER TABLE contacts_new RENAME TO contacts")
+    op.execute("ALTER SEQUENCE contacts_id_seq OWNED BY contacts.id")
+    op.execute(f"ALTER TABLE contacts ADD CONSTRAINT contacts_pkey PRIMARY KEY ({primary_key})")
+    op.execute("ALTER TABLE contacts ADD CONSTRAINT contacts_user_id_fkey "
+               "FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE")
+    for statement in INDEXES:
+        op.execute(statement)
+    op.execute("ANALYZE contacts")
+
+
+def upgrade() -> None:
+    # declarative partitioning is PostgreSQL only, other databases keep the single table
+    partitions = int(context.get_x_argument(as_dictionary=True).get("partitions", PARTITIONS))
+    if op.get_bind().dialect.name != "postgresql" or not partitions:
+        return
+    _rebuild(partitions)
+
+
+def downgrade() -> None:
+    connection = op.get_bind()
+    if connection.dialect.name != "postgresql":
+        return
+    partitioned = connection.exec_driver_sql(
+        "SELECT 1 FROM pg_partitioned_table WHERE partrelid = 'contacts'::regclass").first()
+    if partitioned:
+        _rebuild(0)
@@ -0,0 +1,47 @@
+"""contacts change feed
+
+Revision ID: c4a9e7f2b810
+Revises: 8b2e5d41c7a3
+Create Date: 2026-10-19 14:21:08.302117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4a9e7f2b810'
+down_revision: Union[str, None] = '8b2e5d41c7a3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('contacts', sa.Column('updated_at', sa.DateTime(), nullable=True))
+    op.add_column('contacts', sa.Column('deleted_at', sa.DateTime(), nullable=True))
+    # created_at is now() of the server time zone, the change feed works in naive UTC:
+    # casting to timestamptz reads it in the session time zone, AT TIME ZONE 'utc' converts it back to naive UTC
+    op.execute("UPDATE contacts SET updated_at = coalesce(CAST(created_at AS timestamptz) AT TIME ZONE 'utc', "
+               "now() AT TIME ZONE 'utc')")
+    op.alter_column('contacts', 'updated_at', nullable=False)
+    op.create_index('ix_contacts_user_changes', 'contacts', ['user_id', 'updated_at', 'id'])
+    # tombstones must not block reusing email and phone
+    op.drop_constraint('contacts_email_key', 'contacts', type_='unique')
+    op.drop_constraint('contacts_phone_key', 'contacts', type_='unique')
+    op.create_index('uq_contacts_email_active', 'contacts', ['email'], unique=True,
+                    postgresql_where=sa.text('deleted_at IS NULL'))
+    op.create_index('uq_contacts_phone_active', 'contacts', ['phone'], unique=True,
+                    postgresql_where=sa.text('deleted_at IS NULL'))
+
+
+def downgrade() -> None:
+    op.execute("DELETE FROM contacts WHERE deleted_at IS NOT NULL")
+    op.drop_index('uq_contacts_phone_active', table_name='contacts')
+    op.drop_index('uq_contacts_email_active', table_name='contacts')
+    op.create_unique_constraint('contacts_phone_key', 'contacts', ['phone'])
+    op.create_unique_constraint('contacts_email_key', 'contacts', ['email'])
+    op.drop_index('ix_contacts_user_changes', table_name='contacts')
+    op.drop_column('contacts', 'deleted_at')
+    op.drop_column('contacts', 'updated_at')
@@ -0,0 +1,31 @@
+"""users confirmed indexes
+
+Revision ID: d3f8a61b07c4
+Revises: b6e0d3a9c152
+Create Date: 2026-10-19 20:05:31.482915
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd3f8a61b07c4'
+down_revision: Union[str, None] = 'b6e0d3a9c152'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # login looks up confirmed users only, the purge job looks for old unconfirmed ones
+    op.create_index('ix_users_email_confirmed', 'users', [sa.text('lower(email)')],
+                    postgresql_where=sa.text('confirmed IS TRUE'), sqlite_where=sa.text('confirmed IS 1'))
+    op.create_index('ix_users_unconfirmed_created', 'users', ['crated_at'],
+                    postgresql_where=sa.text('confirmed IS NOT TRUE'), sqlite_where=sa.text('confirmed IS NOT 1'))
+
+
+def downgrade() -> None:
+    op.drop_index('ix_users_unconfirmed_created', table_name='users')
+    op.drop_index('ix_users_email_confirmed', table_name='users')
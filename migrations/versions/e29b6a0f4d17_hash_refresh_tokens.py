@@ -0,0 +1,31 @@
+"""hash refresh tokens
+
+Revision ID: e29b6a0f4d17
+Revises: a71f4c2d8e53
+Create Date: 2026-10-19 18:40:51.230816
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e29b6a0f4d17'
+down_revision: Union[str, None] = 'a71f4c2d8e53'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # refresh tokens are stored as SHA-256 hex digests from now on
+    if op.get_bind().dialect.name == "postgresql":
+        op.execute("UPDATE users SET refresh_token = encode(sha256(refresh_token::bytea), 'hex') "
+                   "WHERE refresh_token IS NOT NULL")
+    else:
+        op.execute("UPDATE users SET refresh_token = NULL")
+
+
+def downgrade() -> None:
+    # hashes can't be turned back into tokens, users log in again
+    op.execute("UPDATE users SET refresh_token = NULL")
@@ -1,6 +1,9 @@
 import os
 
+from typing import Optional
+
 from dotenv import load_dotenv
+from pydantic import model_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -15,9 +18,20 @@ class Settings(BaseSettings):
         BaseSettings (BaseSettings): Parent class
     """
     sqlalchemy_database_url: str
-    jwt_secret_key: str
+    sqlalchemy_echo: bool = False
+    sqlalchemy_pool_size: int = 5               # per worker process
+    sqlalchemy_max_overflow: int = 10
+    sqlalchemy_pool_recycle: int = 1800         # seconds
+    db_pool_warm: int = 1                       # connections opened on startup
+    sqlalchemy_replica_urls: list[str] = []     # read replicas for read-only routes
+    replica_failover_seconds: float = 30        # skip a replica that failed to connect
+    replica_sticky_seconds: float = 5           # reads go to the primary after client's write
+    jwt_secret_key: str = ""                # HS* algorithms only
     jwt_algorithm: str
     jwt_token_ttl: int = 15 # minutes
+    jwt_private_keys: dict[str, str] = {}   # kid -> PEM private key path, RS*/ES*/EdDSA algorithms
+    jwt_public_keys: dict[str, str] = {}    # kid -> PEM public key path, retired keys still accepted
+    jwt_active_kid: Optional[str] = None    # kid used for signing, defaults to the first private key
 
     mail_username: str
     mail_password: str
@@ -29,9 +43,90 @@ class Settings(BaseSettings):
     mail_ssl_tls: bool
     mail_use_credentials: bool
     mail_validate_certs: bool
+    mail_check_on_startup: bool = False         # connect and log in to SMTP server on startup
 
     redis_host: str
     redis_port: int
+    redis_max_connections: int = 50             # per worker process and client
+    redis_pool_warm: int = 1                    # connections opened on startup
+
+    # Rate limits, "times/seconds". Keys are limiter names ("auth", "contacts")
+    # or "<limiter>.<endpoint>" ("contacts.read_contacts")
+    rate_limit_enabled: bool = True
+    rate_limit_default: str = "2/5"             # anonymous clients, per IP
+    rate_limit_user_default: str = "20/5"       # authenticated clients, per user
+    rate_limits: dict[str, str] = {}
+    rate_limits_user: dict[str, str] = {}
+    rate_limit_local: bool = False              # in-process token buckets, synced with Redis periodically
+    rate_limit_sync_seconds: float = 1.0
+    rate_limit_local_buckets: int = 10000       # max number of tracked clients per limiter
+
+    metrics_enabled: bool = True                # /metrics endpoint and request timing middleware
+
+    # SQL debug: log N+1 and slow statements per request, development and CI only
+    sql_debug: bool = False
+    sql_statement_budget: int = 0               # statements per request, 0 - unlimited
+    sql_repeat_threshold: int = 3               # identical statements per request reported as N+1
+    sql_slow_query_ms: float = 100
+
+    contacts_query_max_limit: int = 500         # max contacts returned by search
+    stats_cache_ttl: int = 86400                # seconds, per-user counters in Redis
+    stats_recent_days: int = 7                  # "recently added" window
+    stats_reconcile_seconds: int = 3600         # recount job interval, 0 - disabled
+    changes_settle_seconds: float = 2           # change feed holds back rows younger than this
+    contacts_tombstone_days: int = 30           # deleted contacts kept for the change feed
+    contacts_purge_seconds: int = 86400         # tombstones purge job interval, 0 - disabled
+    events_queue_size: int = 100                # pending push events per connection before resync
+    events_heartbeat_seconds: float = 15        # keeps idle event streams open through proxies
+    phone_default_region: str = "UA"            # country of phone numbers typed without country code
+    phone_cache_ttl: int = 3600                 # seconds, cached reverse lookup of a known number
+    phone_miss_ttl: int = 300                   # seconds, cached reverse lookup of an unknown number
+    login_fail_window: int = 900                # seconds failed logins are remembered
+    login_free_attempts: int = 5                # failures per account before backoff
+    login_ip_free_attempts: int = 20            # failures per IP address before backoff
+    login_backoff_base: float = 1               # seconds, doubled with every next failure
+    login_backoff_max: float = 300              # seconds
+    login_lockout_attempts: int = 20            # failures per account that lock it, 0 - never
+    login_lockout_seconds: float = 900
+    users_unconfirmed_days: int = 7             # unconfirmed signups older than this are deleted
+    users_purge_seconds: int = 86400            # unconfirmed users purge job interval, 0 - disabled
+    users_purge_batch: int = 1000               # users deleted per transaction
+    auth_token_batch: bool = False              # queue refresh token rotations and write them in batches, one worker only
+    auth_token_flush_ms: int = 50               # batch window
+    singleflight_enabled: bool = True           # coalesce identical concurrent reads in a worker
+    cache_headers_enabled: bool = True
+    cache_policies: dict[str, str] = {          # Cache-Control of routes by policy name, "" - no header
+        "root":     "public, max-age=3600",
+        "jwks":     "public, max-age=300, stale-while-revalidate=60",
+        "contacts": "private, no-cache",        # revalidated every time, 304 for unchanged contact
+        "user":     "private, max-age=60",
+        "tokens":   "no-store",
+    }
+    idempotency_enabled: bool = True
+    idempotency_paths: list[str] = ["/api/contacts/", "/auth/signup"]  # POST routes honoring Idempotency-Key
+    idempotency_ttl: int = 86400                # seconds, stored responses are replayed to retries
+    idempotency_lock_seconds: float = 30        # max time of the first request, duplicates get 409 meanwhile
+    dedup_suggest_score: float = 0.6            # duplicate pairs suggested for merge
+    dedup_merge_score: float = 0.9              # duplicate pairs merged by the auto-merge job
+    dedup_block_max: int = 100                  # contacts sharing a blocking key compared pairwise
+    dedup_auto_merge_seconds: int = 0           # auto-merge job interval, 0 - disabled
+    dedup_tag_domains: list[str] = ["gmail.com", "googlemail.com", "outlook.com", "hotmail.com", "live.com",
+                                    "icloud.com", "me.com", "fastmail.com", "proton.me", "protonmail.com"]
+                                                # providers delivering "user+tag" to "user", tags are ignored
+
+    # Server launcher, `python main.py`
+    server_host: str = "0.0.0.0"
+    server_port: int = 8000
+    server_workers: int = 1
+    server_reload: bool = False                 # development only, ignores server_workers
+    server_loop: str = "auto"                   # uvloop if installed
+    server_http: str = "auto"                   # httptools if installed
+    server_keep_alive: int = 5                  # seconds
+    server_graceful_timeout: int = 30           # seconds to finish in-flight requests on shutdown
+    server_forwarded_allow_ips: str = "127.0.0.1"   # proxies trusted with X-Forwarded-For, comma separated
+    shutdown_timeout: float = 10                # seconds to finish background tasks (emails) on shutdown
+    health_timeout: float = 2                   # seconds for each readiness check
+    health_cache_seconds: float = 1
 
     cloudinary_name: str
     cloudinary_api_key: str
@@ -40,6 +135,13 @@ class Settings(BaseSettings):
     # Pydantic 2.X format
     model_config = SettingsConfigDict(env_file=".env", extra='allow')
 
+    @model_validator(mode="after")
+    def check_token_batch(self):
+        # queued rotations live in one worker's memory, other workers would see the old token as reused
+        if self.auth_token_batch and self.server_workers > 1:
+            raise ValueError("auth_token_batch requires server_workers = 1")
+        return self
+
     # that is pydantic 1.x format
     # class Config:
     #     extra = Extra.allow
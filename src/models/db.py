@@ -1,29 +1,262 @@
 """
-Creates database connection Session object
+Creates database connection Session object.
+Engine is created lazily on first use, so every worker process opens its own connection pool.
+Read-only routes may use replicas, see get_read_db.
 """
 
+import hashlib
+import itertools
+import logging
+import os
+import time
+
 import psycopg2
+from fastapi import Depends, Request
 from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session, sessionmaker
 
 from src.config.settings import settings
+from src.services.metrics import instrument_engine
+from src.services.redis_pool import get_redis
+
+logger = logging.getLogger(__name__)
 
 db_uri = settings.sqlalchemy_database_url
 
-engine = create_engine(db_uri, echo=True) 
+_engine: Engine | None = None
+
+SessionLocal = sessionmaker(autocommit=False, autoflush=False)
+
+
+def _create_engine(uri: str) -> Engine:
+    """
+    Create instrumented engine with pool options from settings
+
+    Args:
+        uri (str): Database URL
+
+    Returns:
+        Engine: SQLAlchemy engine
+    """
+    options = {"echo": settings.sqlalchemy_echo, "pool_pre_ping": True}
+    if not uri.startswith("sqlite"):
+        options.update(pool_size=settings.sqlalchemy_pool_size,
+                       max_overflow=settings.sqlalchemy_max_overflow,
+                       pool_recycle=settings.sqlalchemy_pool_recycle)
+    engine = create_engine(uri, **options)
+    instrument_engine(engine)
+    return engine
+
+
+def get_engine() -> Engine:
+    """
+    Get SQLAlchemy engine, create it on the first call
+
+    Returns:
+        Engine: SQLAlchemy engine
+    """
+    global _engine
+    if _engine is None:
+        _engine = _create_engine(db_uri)
+    return _engine
+
+
+class ReplicaRouter:
+    '''
+    Round-robin over read replicas. A replica that fails to connect is skipped for `replica_failover_seconds`.
+    Clients that wrote recently are kept on the primary for `replica_sticky_seconds` (read-after-write).
+    '''
+    def __init__(self, urls: list[str]):
+        """
+        Args:
+            urls (list[str]): Replica database URLs
+        """
+        self.urls       = urls
+        self._engines   = None
+        self._next      = itertools.count()
+        self._down_till = {}
+
+    @property
+    def configured(self) -> bool:
+        return bool(self.urls)
+
+    def engines(self) -> list[Engine]:
+        """
+        Replica engines, created on the first call
+
+        Returns:
+            list[Engine]: engines
+        """
+        if self._engines is None:
+            self._engines = [_create_engine(url) for url in self.urls]
+        return self._engines
+
+    def candidates(self) -> list[Engine]:
+        """
+        Healthy replicas, starting from the next one in round-robin order
+
+        Returns:
+            list[Engine]: engines to try
+        """
+        engines = self.engines()
+        start = next(self._next) % len(engines)
+        now = time.monotonic()
+        ordered = engines[start:] + engines[:start]
+        return [engine for engine in ordered if self._down_till.get(engine, 0) <= now]
+
+    def mark_down(self, engine: Engine) -> None:
+        """
+        Skip replica for a while after connection failure
+
+        Args:
+            engine (Engine): Failed replica
+        """
+        logger.warning("Replica %s is down", engine.url.render_as_string(hide_password=True))
+        self._down_till[engine] = time.monotonic() + settings.replica_failover_seconds
+
+    @staticmethod
+    def client_key(request: Request) -> str:
+        """
+        Key of the client for read-after-write stickiness: bearer token or IP address
+
+        Args:
+            request (Request): The request object
+
+        Returns:
+            str: Redis key
+        """
+        client = request.headers.get("Authorization") or (request.client.host if request.client else "")
+        return "db:primary:" + hashlib.sha1(client.encode()).hexdigest()
+
+    def mark_write(self, request: Request) -> None:
+        """
+        Keep the client on the primary for `replica_sticky_seconds`
+
+        Args:
+            request (Request): The request object
+        """
+        try:
+            get_redis().set(self.client_key(request), 1, px=int(settings.replica_sticky_seconds * 1000))
+        except Exception as err:
+            logger.warning("Can't mark client as writer: %s", err)
+
+    def wrote_recently(self, request: Request) -> bool:
+        """
+        Check if the client wrote recently. Primary is used when Redis is unavailable.
+
+        Args:
+            request (Request): The request object
+
+        Returns:
+            bool: True if reads must go to the primary
+        """
+        try:
+            return bool(get_redis().exists(self.client_key(request)))
+        except Exception:
+            return True
+
+    def dispose(self) -> None:
+        """
+        Close replica pools
+        """
+        for engine in self._engines or []:
+            engine.dispose()
+        self._engines = None
+
+
+replicas = ReplicaRouter(settings.sqlalchemy_replica_urls)
+
+
+def dispose_engine() -> None:
+    """
+    Close all pooled connections and forget the engine
+    """
+    global _engine
+    if _engine is not None:
+        _engine.dispose()
+        _engine = None
+    replicas.dispose()
+
+
+def _forget_engine_after_fork() -> None:
+    # connections inherited from the parent process must not be used or closed by the child
+    global _engine
+    if _engine is not None:
+        _engine.dispose(close=False)
+        _engine = None
+    for engine in replicas._engines or []:
+        engine.dispose(close=False)
+    replicas._engines = None
+
+
+os.register_at_fork(after_in_child=_forget_engine_after_fork)
+
+
+def __getattr__(name: str):
+    # backward compatible module attribute: `from src.models.db import engine`
+    if name == "engine":
+        return get_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 # Dependency
-def get_db():
+def get_db(request: Request):
     """
-    Get database session object
+    Get primary database session object.
+    Requests that may write keep the client on the primary for a while.
+
+    Args:
+        request (Request): The request object
 
     Yields:
         Session: DB session
     """
-    db = SessionLocal()
+    if replicas.configured and request.method not in ("GET", "HEAD", "OPTIONS"):
+        replicas.mark_write(request)
+    db = SessionLocal(bind=get_engine())
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+def get_read_db(request: Request, db: Session = Depends(get_db)):
+    """
+    Get database session for read-only routes: a healthy replica in round-robin order,
+    the primary if no replicas are configured, all of them are down or the client wrote recently.
+    Primary session is not connected until used, so it costs nothing when a replica is picked.
+    The choice is left in `request.state.read_from`: "primary", "replica" or "pinned" (primary after a write).
+
+    Args:
+        request (Request): The request object
+        db (Session): Primary DB session. Defaults to Depends(get_db).
+
+    Yields:
+        Session: DB session
+    """
+    request.state.read_from = "primary"
+    if not replicas.configured:
+        yield db
+        return
+    if replicas.wrote_recently(request):
+        request.state.read_from = "pinned"
+        yield db
+        return
+    request.state.read_from = "replica"
+    for engine in replicas.candidates():
+        replica = SessionLocal(bind=engine)
+        try:
+            replica.connection()
+        except OperationalError:
+            replica.close()
+            replicas.mark_down(engine)
+            continue
+        try:
+            yield replica
+        finally:
+            replica.close()
+        return
+    request.state.read_from = "primary"
+    yield db
@@ -1,4 +1,6 @@
-from sqlalchemy import Integer, Column, String, Date, func, Boolean
+from datetime import datetime
+
+from sqlalchemy import Integer, Column, String, Date, func, Boolean, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.sql.sqltypes import DateTime
@@ -18,13 +20,36 @@ class Contact(Base):
     id            = Column(Integer, primary_key=True)
     first_name    = Column('name', String(50), nullable=False)
     last_name     = Column('surname', String(50), nullable=False)
-    email         = Column('email', String(100), unique=True, nullable=False)
-    phone         = Column('phone', String(15), unique=True, nullable=False)
+    email         = Column('email', String(100), nullable=False)
+    phone         = Column('phone', String(15), nullable=False)
+    phone_e164    = Column('phone_e164', String(16), nullable=True)
     birthday      = Column('birthday', Date, nullable=False)
     notes         = Column('notes', String, nullable=True, default="")
     user_id       = Column('user_id', ForeignKey('users.id', ondelete='CASCADE'), default=None)
+    created_at    = Column('created_at', DateTime, default=func.now(), server_default=func.now())
+    updated_at    = Column('updated_at', DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+    deleted_at    = Column('deleted_at', DateTime, nullable=True)
     user          = relationship('User', backref='contacts')
 
+# On PostgreSQL the table may be hash-partitioned by user_id (migration b6e0d3a9c152, primary key (id, user_id)),
+# so every query of contacts filters by user_id and touches one partition.
+
+# case-insensitive lookups: queries compare lower(column) with lowercased input
+Index('ix_contacts_name_lower', func.lower(Contact.first_name))
+Index('ix_contacts_surname_lower', func.lower(Contact.last_name))
+# recently added contacts of the user
+Index('ix_contacts_user_created', Contact.user_id, Contact.created_at)
+# reverse phone lookup (caller ID)
+Index('ix_contacts_user_phone_e164', Contact.user_id, Contact.phone_e164)
+# change feed cursor
+Index('ix_contacts_user_changes', Contact.user_id, Contact.updated_at, Contact.id)
+# email and phone are unique within the user's address book,
+# deleted contacts stay as tombstones and must not block reusing their email and phone
+Index('uq_contacts_user_email_active', Contact.user_id, Contact.email, unique=True,
+      postgresql_where=Contact.deleted_at.is_(None), sqlite_where=Contact.deleted_at.is_(None))
+Index('uq_contacts_user_phone_active', Contact.user_id, Contact.phone, unique=True,
+      postgresql_where=Contact.deleted_at.is_(None), sqlite_where=Contact.deleted_at.is_(None))
+
 class User(Base):
     """
     Class for User object that will be used by sqlalchemy 
@@ -41,4 +66,11 @@ class User(Base):
     refresh_token   = Column(String(255), nullable=True)
     confirmed       = Column(Boolean, default=False)
     avatar          = Column(String(255), nullable=True)
-    
\ No newline at end of file
+
+Index('uq_users_email_lower', func.lower(User.email), unique=True)
+# login reads only confirmed users: this index stays small while unconfirmed signups come and go
+Index('ix_users_email_confirmed', func.lower(User.email),
+      postgresql_where=User.confirmed.is_(True), sqlite_where=User.confirmed.is_(True))
+# unconfirmed users purge job
+Index('ix_users_unconfirmed_created', User.created_at,
+      postgresql_where=User.confirmed.isnot(True), sqlite_where=User.confirmed.isnot(True))
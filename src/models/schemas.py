@@ -1,5 +1,5 @@
 from datetime import date, datetime
-from typing import Optional
+from typing import Literal, Optional
 from pydantic import BaseModel, Field, EmailStr
 # from pydantic_extra_types.phone_numbers import PhoneNumber 
 
@@ -20,25 +20,105 @@ class ContactModel(BaseModel):
     notes:      Optional[str] = Field(default=None, description="Contact notes")
 
 
-class ContactResponse(ContactModel):
+class ContactResponse(BaseModel):
     """
-    Contact Response schema for pydantic validation
+    Contact Response schema. Read side only: plain types without input validators,
+    so rows from the DB are serialized as they are (see src.services.serialization).
+    List routes return only the fields requested with `fields=` ("summary" - without birthday and notes).
 
     Args:
-        ContactModel: Inherited from ContactModel
+        BaseModel: Inherited from BaseModel
     """
     id:         int
     first_name: str
     last_name:  str
     email:      str
     phone:      str
-    birthday:   date 
-    notes:      str
+    birthday:   date
+    notes:      Optional[str] = None
 
     class Config:
         from_attributes = True
 
 
+class ContactChange(ContactResponse):
+    """
+    Contact change schema for pydantic validation, deleted contacts have `deleted_at` set
+
+    Args:
+        ContactResponse: Inherited from ContactResponse
+    """
+    updated_at: datetime
+    deleted_at: Optional[datetime] = None
+
+
+class ContactChanges(BaseModel):
+    """
+    Change feed page schema for pydantic validation
+
+    Args:
+        BaseModel: Inherited from BaseModel
+    """
+    changes:    list[ContactChange]
+    cursor:     str = Field(description="Pass as `since` to get the next changes")
+    has_more:   bool
+
+
+class DuplicatePair(BaseModel):
+    """
+    Merge suggestion schema for pydantic validation
+
+    Args:
+        BaseModel: Inherited from BaseModel
+    """
+    contact_ids:    list[int]
+    score:          float
+    reasons:        list[str] = Field(description="Matched signals: email, phone, name, birthday")
+
+
+class MergeRequest(BaseModel):
+    """
+    Contacts merge schema for pydantic validation
+
+    Args:
+        BaseModel: Inherited from BaseModel
+    """
+    keep:       int = Field(description="ID of the contact to keep")
+    duplicates: list[int] = Field(min_length=1, description="IDs of the contacts merged into it and deleted")
+
+
+class ContactFilter(BaseModel):
+    """
+    Contact search criteria. All given criteria are combined with AND or OR in a single query.
+
+    Args:
+        BaseModel: Inherited from BaseModel
+    """
+    first_name:     Optional[str] = None
+    last_name:      Optional[str] = None
+    email:          Optional[str] = None
+    phone:          Optional[str] = None
+    birthday_from:  Optional[date] = None
+    birthday_to:    Optional[date] = None
+    notes:          Optional[str] = Field(default=None, description="Notes contain the text")
+    match:          Literal["all", "any"] = "all"
+    sort:           str = Field(default="id", description="Field name, '-' prefix for descending order")
+    limit:          int = 100
+
+
+class ContactStats(BaseModel):
+    """
+    Contact statistics schema for pydantic validation
+
+    Args:
+        BaseModel: Inherited from BaseModel
+    """
+    total:          int
+    by_birth_month: dict[int, int]
+    recently_added: int
+    recent_days:    int
+
+
 class UserModel(BaseModel):
     """
     User Model schema for pydantic validation
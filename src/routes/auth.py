@@ -5,16 +5,19 @@ from typing import List
 from sqlalchemy.orm import Session
 from fastapi import APIRouter, HTTPException, Depends, status, Security, BackgroundTasks, Request
 from fastapi.security import OAuth2PasswordRequestForm, HTTPBearer, HTTPAuthorizationCredentials
-from fastapi_limiter.depends import RateLimiter
+from starlette.concurrency import run_in_threadpool
 
 from src.models.db import get_db
 from src.services.auth import auth_service
+from src.services import bruteforce
+from src.services.caching import CachePolicy
+from src.services.ratelimit import RateLimit
 from src.models.schemas import UserModel, UserResponse, TokenModel, RequestEmail
-from src.services.users import get_user_by_email, create_user, update_token, confirmed_email
+from src.services.users import get_user_by_email, get_login, insert_user, store_token, token_matches, confirmed_email
 from src.services.email import send_email
 
 
-router   = APIRouter(prefix='', tags=["auth"], dependencies=[Depends(RateLimiter(times=2, seconds=5))])
+router   = APIRouter(prefix='', tags=["auth"], dependencies=[Depends(RateLimit("auth"))])
 security = HTTPBearer()
 
 @router.post("/signup", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
@@ -37,25 +40,30 @@ async def signup(body: UserModel,
     Returns:
         UserResponse: User attributes and a simple message
     """
-    # check if user exists
-    exist_user = await get_user_by_email(body.email, db)
-    if exist_user:
+    # one INSERT ... ON CONFLICT DO NOTHING, existing account is a conflict, not a separate lookup.
+    # Password is hashed for existing accounts too, so the response time does not reveal them.
+    body.password = await run_in_threadpool(auth_service.get_password_hash, body.password)
+    new_user = await insert_user(body, db)
+    if new_user is None:
         raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Account already exists")
-    body.password = auth_service.get_password_hash(body.password)
-    new_user = await create_user(body, db)
     background_tasks.add_task(send_email, new_user.email, new_user.username, request.base_url)
     return {"user": new_user, "detail": "User successfully created"}
 
 @router.post("/login", response_model=TokenModel)
-async def login(body: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+async def login(request: Request, body: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
     """
     Existing user log in function.
+    Reads only the login columns, verifies the password in the thread pool (bcrypt does not block the event loop)
+    and stores the refresh token hash with one UPDATE.
+    Clients with recent failures are rejected before the DB lookup and bcrypt, see src.services.bruteforce.
 
     Args:
+        request (Request): The request object
         body (OAuth2PasswordRequestForm): Dependency injection for FastAPI OAuth2 authentication.
         db (Session): Dependency injection for DB session. Defaults to Depends(get_db).
 
     Raises:
+        HTTPException: 429 Too Many Requests. Too many failed attempts, Retry-After header tells when to retry.
         HTTPException: 401 Unauthorized. The user's email has not been found in users DB.
         HTTPException: 401 Unauthorized. The user's email has not been confirmed.
         HTTPException: 401 Unauthorized. The password is invalid.
@@ -63,44 +71,54 @@ async def login(body: OAuth2PasswordRequestForm = Depends(), db: Session = Depen
     Returns:
         TokenModel: json with access token, refresh token and token type
     """
-    user = await get_user_by_email(body.username, db)
+    ip = RateLimit.client_ip(request)
+    wait = await bruteforce.retry_after(body.username, ip)
+    if wait:
+        raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail="Too many failed login attempts",
+                            headers={"Retry-After": str(wait)})
+    user = await get_login(body.username, db)
     if user is None:
+        await bruteforce.failed(body.username, ip)
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid email")
     if not user.confirmed:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Email not confirmed")
-    if not auth_service.verify_password(body.password, user.password):
+    if not await run_in_threadpool(auth_service.verify_password, body.password, user.password):
+        await bruteforce.failed(body.username, ip)
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid password")
+    await bruteforce.succeeded(body.username)
     # Generate JWT
     access_token = await auth_service.create_access_token(data={"sub": user.email})
     refresh_token = await auth_service.create_refresh_token(data={"sub": user.email})
-    await update_token(user, refresh_token, db)
+    await store_token(user.id, refresh_token, db)
     return {"access_token": access_token, "refresh_token": refresh_token, "token_type": "bearer"}
 
-@router.get("/refresh", response_model=TokenModel)
+@router.get("/refresh", response_model=TokenModel, dependencies=[Depends(CachePolicy("tokens"))])
 async def refresh_token(credentials: HTTPAuthorizationCredentials = Security(security), db: Session = Depends(get_db)):
     """
     Refresh access token if expired.
+    The token is compared with the stored hash, a reused (stolen) refresh token revokes the current one.
 
     Args:
         credentials (HTTPAuthorizationCredentials): Dependency injection for user authentication. Defaults to Security(security).
         db (Session): Dependency injection for DB session. Defaults to Depends(get_db).
 
     Raises:
-        HTTPException: [description]
+        HTTPException: 401 Unauthorized. The refresh token is not the current one.
 
     Returns:
         TokenModel: json with access token, refresh token and token type
     """
     token = credentials.credentials
     email = await auth_service.get_email_from_refresh_token(token)
-    user = await get_user_by_email(email, db)
-    if user.refresh_token != token:
-        await update_token(user, None, db)
+    user = await get_login(email, db)
+    if user is None or not token_matches(token, user.id, user.refresh_token):
+        if user is not None:
+            await store_token(user.id, None, db)
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid refresh token")
 
     access_token = await auth_service.create_access_token(data={"sub": email})
     refresh_token = await auth_service.create_refresh_token(data={"sub": email})
-    await update_token(user, refresh_token, db)
+    await store_token(user.id, refresh_token, db)
     return {"access_token": access_token, "refresh_token": refresh_token, "token_type": "bearer"}
 
 @router.get("/confirm_email/{token}")
@@ -1,42 +1,108 @@
-from typing import List
+import asyncio
+import json
+from datetime import date
+from typing import List, Literal, Optional
 
-from fastapi import APIRouter, HTTPException, Depends, status
-from fastapi_limiter.depends import RateLimiter
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 
-from src.models.db import get_db
+from src.config.settings import settings
+from src.models.db import SessionLocal, get_db, get_read_db
 from src.models.models import Contact
-from src.models.schemas import ContactModel, ContactResponse,UserModel
-from src.services import contacts
+from src.models.schemas import (ContactModel, ContactResponse, ContactFilter, ContactStats, ContactChanges,
+                                DuplicatePair, MergeRequest, UserModel)
+from src.services import contacts, stats, dedup
 from src.services.auth import auth_service
+from src.services.caching import CachePolicy, not_modified
+from src.services.events import event_hub
+from src.services.ratelimit import RateLimit
+from src.services.serialization import rows_json, rows_response
+from src.services.singleflight import single_flight
 
 
-router = APIRouter(prefix='/contacts', dependencies=[Depends(RateLimiter(times=2, seconds=5))])
+SORT_PATTERN = "^-?(" + "|".join(contacts.SORT_FIELDS) + ")$"
+
+router = APIRouter(prefix='/contacts', dependencies=[Depends(RateLimit("contacts")), Depends(CachePolicy("contacts"))])
+
+
+def fieldset(fields: Optional[str] = Query(None, description="Comma separated field names or 'summary', all fields by default")) -> tuple:
+    """
+    Dependency: columns to select for list routes (sparse fieldsets)
+
+    Args:
+        fields (str, optional): Comma separated field names or "summary". Defaults to None - all fields.
+
+    Raises:
+        HTTPException: 400 BadRequest - unknown field
+
+    Returns:
+        tuple: SQLAlchemy columns
+    """
+    try:
+        return contacts.select_columns(fields)
+    except ValueError as err:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(err))
+
+
+def flight_key(request: Request, name: str, user_id: int, columns: tuple, *params) -> tuple | None:
+    """
+    Single flight key of a read: the database it goes to, user, parameters and field names.
+    Clients pinned to the primary after a write are not coalesced, a flight started before
+    their write could miss it.
+    """
+    read_from = request.state.read_from
+    if read_from == "pinned":
+        return None
+    return (name, read_from, user_id, *params, tuple(column.key for column in columns))
+
+
+# Single flights run in the thread pool with their own session on the engine the request picked,
+# followers get JSON bytes built from plain rows, no session or ORM object crosses requests.
+
+def read_page(bind, skip: int, limit: int, user_id: int, columns: tuple) -> bytes:
+    with SessionLocal(bind=bind) as db:
+        return rows_json(contacts.contact_rows(skip, limit, db, user_id, columns), ContactResponse)
+
+
+def read_birthdays(bind, days: int, today: bool, user_id: int, columns: tuple) -> bytes:
+    with SessionLocal(bind=bind) as db:
+        return rows_json(contacts.birthday_rows(days, today, db, user_id, columns), ContactResponse)
 
 
 @router.get("/", response_model=List[ContactResponse])
-async def read_contacts(skip: int = 0, 
+async def read_contacts(request: Request,
+                        skip: int = 0, 
                         limit: int = 100, 
-                        db: Session = Depends(get_db)
+                        columns: tuple = Depends(fieldset),
+                        db: Session = Depends(get_read_db),
+                        current_user: UserModel = Depends(auth_service.get_current_user)
                         ):
     """
-    Get contacts from the database.
+    Get user's contacts from the database.
+    Authentication required.
 
     Args:
+        request (Request): The request object
         skip (int): Number of contacts from start to be skipped. Defaults to 0.
         limit (int): Number of contacts to be returned. Defaults to 100.
-        db (Session):git status Dependency injection for DB session. Defaults to Depends(get_db).
+        columns (tuple): Dependency injection for the requested fields. Defaults to Depends(fieldset).
+        db (Session):git status Dependency injection for DB session, a replica may be used. Defaults to Depends(get_read_db).
+        current_user (UserModel): Dependency injection for the current user. Defaults to Depends(auth_service.get_current_user).
 
     Returns:
         List[ContactResponse]: list of contacts
     """
-    list_of_contacts = await contacts.get_contacts(skip, limit, db)
-    return list_of_contacts
+    key = flight_key(request, "contacts", current_user.id, columns, skip, limit)
+    body = await single_flight.do(key, read_page, db.get_bind(), skip, limit, current_user.id, columns)
+    return Response(content=body, media_type="application/json")
 
 @router.get("/query/birtdays", response_model=List[ContactResponse])
-async def find_contacts_with_birthdays( days: int = 7, 
+async def find_contacts_with_birthdays( request: Request,
+                                        days: int = 7, 
                                         today: bool = False, 
-                                        db: Session = Depends(get_db), 
+                                        columns: tuple = Depends(fieldset),
+                                        db: Session = Depends(get_read_db), 
                                         current_user: UserModel = Depends(auth_service.get_current_user)
                                        ):
     """
@@ -44,9 +110,11 @@ async def find_contacts_with_birthdays( days: int = 7,
     Authentication required.
 
     Args:
+        request (Request): The request object
         days (int): Number of days from today. Defaults to 7.
         today (bool): Include today or not. Defaults to False.
-        db (Session): Dependency injection for DB session. Defaults to Depends(get_db).
+        columns (tuple): Dependency injection for the requested fields. Defaults to Depends(fieldset).
+        db (Session): Dependency injection for DB session, a replica may be used. Defaults to Depends(get_read_db).
         current_user (UserModel): Dependency injection for the current user. Defaults to Depends(auth_service.get_current_user).
 
     Raises:
@@ -55,28 +123,45 @@ async def find_contacts_with_birthdays( days: int = 7,
     Returns:
         List[ContactResponse]: list of contacts that have birthday in next 'days' days
     """
-    contacts = await contacts.find_contacts_with_birthdays(days, today, db)
-    if contacts == [] or contacts is None:
+    key = flight_key(request, "birthdays", current_user.id, columns, days, today)
+    body = await single_flight.do(key, read_birthdays, db.get_bind(), days, today, current_user.id, columns)
+    if body == b"[]":
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="contacts not found")
-    return contacts
+    return Response(content=body, media_type="application/json")
 
 @router.get("/query", response_model=List[ContactResponse])
 async def find_contacts(first_name: str = "",
                         last_name: str = "",
                         email: str = "",
-                        db: Session = Depends(get_db),
+                        phone: str = "",
+                        birthday_from: Optional[date] = None,
+                        birthday_to: Optional[date] = None,
+                        notes: str = "",
+                        match: Literal["all", "any"] = "all",
+                        sort: str = Query("id", pattern=SORT_PATTERN),
+                        limit: int = Query(100, ge=1),
+                        columns: tuple = Depends(fieldset),
+                        db: Session = Depends(get_read_db),
                         current_user: UserModel = Depends(auth_service.get_current_user)
                         ):
     """
-    Search for the contact by given parameter.
-    Only first given parameter is evaluated. I.e. if first name ane email are given - search will be made by the first  name only.
+    Search for contacts by several criteria with a single query.
+    All given criteria must match (match=all) or at least one of them (match=any).
     Authentication required.
 
     Args:
         first_name (str): Search by first name. Defaults to "".
         last_name (str): Search by last name. Defaults to "".
         email (str): Search by email. Defaults to "".
-        db (Session): Dependency injection for DB session. Defaults to Depends(get_db).
+        phone (str): Search by phone. Defaults to "".
+        birthday_from (date, optional): Born on or after the date. Defaults to None.
+        birthday_to (date, optional): Born on or before the date. Defaults to None.
+        notes (str): Notes contain the text. Defaults to "".
+        match (str): "all" or "any". Defaults to "all".
+        sort (str): Sort field, '-' prefix for descending order. Defaults to "id".
+        limit (int): Max number of contacts, capped by settings. Defaults to 100.
+        columns (tuple): Dependency injection for the requested fields. Defaults to Depends(fieldset).
+        db (Session): Dependency injection for DB session, a replica may be used. Defaults to Depends(get_read_db).
         current_user (UserModel): Dependency injection for the current user. Defaults to Depends(auth_service.get_current_user).
 
     Raises:
@@ -85,34 +170,193 @@ async def find_contacts(first_name: str = "",
     Returns:
         List[ContactResponse]: list of contacts by given search criteria
     """
-    contacts = await contacts.find_contacts(first_name, last_name, email, db)
-    if contacts == [] or contacts is None:
+    criteria = ContactFilter(first_name=first_name, last_name=last_name, email=email, phone=phone,
+                             birthday_from=birthday_from, birthday_to=birthday_to, notes=notes,
+                             match=match, sort=sort, limit=limit)
+    found = await contacts.find_contacts(criteria, db, current_user, columns)
+    if found == [] or found is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="contacts not found")
-    return contacts
+    return rows_response(found, ContactResponse)
+
+@router.get("/stats", response_model=ContactStats)
+async def read_contacts_stats(db: Session = Depends(get_read_db),
+                              current_user: UserModel = Depends(auth_service.get_current_user)
+                              ):
+    """
+    Get the current user's contact statistics without fetching the contacts.
+    Authentication required.
+
+    Args:
+        db (Session): Dependency injection for DB session, a replica may be used. Defaults to Depends(get_read_db).
+        current_user (UserModel): Dependency injection for the current user. Defaults to Depends(auth_service.get_current_user).
+
+    Returns:
+        ContactStats: total number of contacts, numbers by birth month and recently added
+    """
+    return await stats.get_stats(current_user.id, db)
+
+@router.get("/changes", response_model=ContactChanges)
+async def read_contacts_changes(since: Optional[str] = None,
+                                limit: int = Query(100, ge=1),
+                                db: Session = Depends(get_db),
+                                current_user: UserModel = Depends(auth_service.get_current_user)
+                                ):
+    """
+    Get the current user's contacts created, updated or deleted since the cursor, for incremental sync.
+    Start without `since`, then pass the returned cursor until `has_more` is false.
+    Reads the primary, a lagging replica could make the cursor skip changes.
+    Authentication required.
+
+    Args:
+        since (str, optional): Cursor from the previous response. Defaults to None - full sync.
+        limit (int): Max number of changes, capped by settings. Defaults to 100.
+        db (Session): Dependency injection for DB session. Defaults to Depends(get_db).
+        current_user (UserModel): Dependency injection for the current user. Defaults to Depends(auth_service.get_current_user).
+
+    Raises:
+        HTTPException: 400 BadRequest - malformed cursor
+        HTTPException: 410 Gone - cursor expired, full sync required
+
+    Returns:
+        ContactChanges: changed contacts, deleted ones have `deleted_at` set, and the next cursor
+    """
+    return await contacts.get_changes(since, limit, db, current_user)
+
+@router.get("/events")
+async def stream_contacts_events(request: Request,
+                                 db: Session = Depends(get_read_db),
+                                 current_user: UserModel = Depends(auth_service.get_current_user)
+                                 ) -> StreamingResponse:
+    """
+    Push the current user's contact changes as server-sent events instead of polling.
+    Events are "created", "updated" and "deleted" with the contact and its change feed cursor as the event id.
+    "resync" means events were lost, catch up with /changes from the last received id.
+    Authentication required.
+
+    Args:
+        request (Request): The request object
+        db (Session): Dependency injection for DB session used by authentication. Defaults to Depends(get_read_db).
+        current_user (UserModel): Dependency injection for the current user. Defaults to Depends(auth_service.get_current_user).
+
+    Returns:
+        StreamingResponse: text/event-stream
+    """
+    # the stream may stay open for hours, do not hold a pooled connection for it
+    db.close()
+
+    async def stream():
+        async with event_hub.subscribe(current_user.id) as queue:
+            yield ": connected\n\n"
+            while not await request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(queue.get(), settings.events_heartbeat_seconds)
+                except asyncio.TimeoutError:
+                    yield ": heartbeat\n\n"
+                    continue
+                cursor = f"id: {event['cursor']}\n" if "cursor" in event else ""
+                yield f"event: {event['event']}\n{cursor}data: {json.dumps(event.get('contact'))}\n\n"
+
+    return StreamingResponse(stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@router.get("/lookup", response_model=ContactResponse)
+async def lookup_phone(phone: str = Query(min_length=3, max_length=32),
+                       db: Session = Depends(get_db),
+                       current_user: UserModel = Depends(auth_service.get_current_user)
+                       ):
+    """
+    Caller ID: get the contact with the phone number, written in any format.
+    Answers are cached, so misses read the primary: a lagging replica would put a stale answer in the cache.
+    Authentication required.
+
+    Args:
+        phone (str): Phone number, local numbers are parsed for the default region
+        db (Session): Dependency injection for DB session. Defaults to Depends(get_db).
+        current_user (UserModel): Dependency injection for the current user. Defaults to Depends(auth_service.get_current_user).
+
+    Raises:
+        HTTPException: 404 NotFound - no contact with the number
+
+    Returns:
+        ContactResponse: contact attributes
+    """
+    found = await contacts.lookup_phone(phone, db, current_user)
+    if found is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="contact not found")
+    return Response(content=found, media_type="application/json")
+
+@router.get("/duplicates", response_model=List[DuplicatePair])
+async def read_duplicates(db: Session = Depends(get_read_db),
+                          current_user: UserModel = Depends(auth_service.get_current_user)
+                          ):
+    """
+    Get merge suggestions: pairs of the current user's contacts that look like the same person.
+    Authentication required.
+
+    Args:
+        db (Session): Dependency injection for DB session, a replica may be used. Defaults to Depends(get_read_db).
+        current_user (UserModel): Dependency injection for the current user. Defaults to Depends(auth_service.get_current_user).
+
+    Returns:
+        List[DuplicatePair]: contact ID pairs with score and matched signals, best first
+    """
+    return await dedup.get_duplicates(db, current_user)
+
+@router.post("/merge", response_model=ContactResponse)
+async def merge_contacts(body: MergeRequest,
+                         db: Session = Depends(get_db),
+                         current_user: UserModel = Depends(auth_service.get_current_user)
+                         ):
+    """
+    Merge duplicates into one contact: their notes are appended to it and they are deleted.
+    Authentication required.
+
+    Args:
+        body (MergeRequest): Contact to keep and its duplicates
+        db (Session): Dependency injection for DB session. Defaults to Depends(get_db).
+        current_user (UserModel): Dependency injection for the current user. Defaults to Depends(auth_service.get_current_user).
+
+    Raises:
+        HTTPException: 404 NotFound - any of the contacts not found
+
+    Returns:
+        ContactResponse: The Contact attributes for the contact that was kept
+    """
+    contact = await dedup.merge_contacts(body.keep, body.duplicates, db, current_user)
+    if contact is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="contact not found")
+    return contact
 
 @router.get("/{contact_id}", response_model=ContactResponse)
 async def read_contact( contact_id: int, 
-                        db: Session = Depends(get_db), 
+                        request: Request,
+                        response: Response,
+                        db: Session = Depends(get_read_db), 
                         current_user: UserModel = Depends(auth_service.get_current_user)
                         ):
     """
     Get contact by its ID.
     Authentication required.
+    Conditional GET: 304 Not Modified if the contact was not updated since If-Modified-Since.
 
     Args:
         contact_id (int): Contact ID
-        db (Session): Dependency injection for DB session. Defaults to Depends(get_db).
+        request (Request): The request object
+        response (Response): Response object to set Last-Modified header
+        db (Session): Dependency injection for DB session, a replica may be used. Defaults to Depends(get_read_db).
         current_user (UserModel): Dependency injection for the current user. Defaults to Depends(auth_service.get_current_user).
 
     Raises:
         HTTPException:  404 NotFound - no contacts found with given ID.
 
     Returns:
-        ContactResponse: contact attributes 
+        ContactResponse | Response: contact attributes, empty 304 response
     """
-    contact = await contacts.get_contact(contact_id, db)
+    contact = await contacts.get_contact(contact_id, db, current_user)
     if contact is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="contact not found")
+    if not_modified(request, response, contact.updated_at):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"Last-Modified": response.headers["Last-Modified"]})
     return contact
 
 @router.post("/", response_model=ContactResponse)
@@ -156,7 +400,7 @@ async def update_contact(body: ContactModel,
     Returns:
         ContactResponse: The Contact attributes for the contact that was updated
     """
-    contact = await contacts.update_contact(contact_id, body, db)
+    contact = await contacts.update_contact(contact_id, body, db, current_user)
     if contact is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="contact not found")
     return contact
@@ -179,7 +423,7 @@ async def delete_contact(contact_id: int,
     Returns:
         ContactResponse: The Contact attributes for the contact that was deleted
     """
-    contact = await contacts.delete_contact(contact_id, db)
+    contact = await contacts.delete_contact(contact_id, db, current_user)
     if contact is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="contact not found")
     return contact
@@ -0,0 +1,36 @@
+"""
+FastAPI routes module for liveness and readiness probes
+"""
+from fastapi import APIRouter, Response, status
+
+from src.services.resources import resources
+
+
+router = APIRouter(prefix='/health', tags=["health"])
+
+@router.get("/live")
+async def liveness() -> dict:
+    """
+    The worker process is running and serves requests
+
+    Returns:
+        dict: json message
+    """
+    return {"status": "alive"}
+
+@router.get("/ready")
+async def readiness(response: Response) -> dict:
+    """
+    The worker has opened its pools, DB and Redis answer and it is not shutting down.
+
+    Args:
+        response (Response): The response object
+
+    Returns:
+        dict: readiness flag and results of the checks, 503 status if not ready
+    """
+    checks = await resources.check() if resources.ready else {}
+    ready = resources.ready and all(checks.values())
+    if not ready:
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    return {"ready": ready, "checks": checks}
@@ -0,0 +1,21 @@
+"""
+FastAPI routes module for publishing JWT verification keys
+"""
+from fastapi import APIRouter, Depends
+
+from src.services.auth import auth_service
+from src.services.caching import CachePolicy
+
+
+router = APIRouter(prefix='/.well-known', tags=["jwks"], dependencies=[Depends(CachePolicy("jwks"))])
+
+@router.get("/jwks.json")
+async def read_jwks() -> dict:
+    """
+    Public keys that other services use to verify our tokens locally.
+    Empty key set when tokens are signed with a shared secret.
+
+    Returns:
+        dict: JWK Set
+    """
+    return auth_service.keys.jwks()
@@ -0,0 +1,20 @@
+"""
+FastAPI routes module for metrics scraping
+"""
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from src.services.metrics import registry
+
+
+router = APIRouter(prefix='', tags=["metrics"])
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def read_metrics() -> PlainTextResponse:
+    """
+    Request latency, DB, Redis and bcrypt timings in Prometheus text format
+
+    Returns:
+        PlainTextResponse: metrics
+    """
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
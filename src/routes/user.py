@@ -8,11 +8,12 @@ from src.models.models import User
 from src.models.schemas import UserDb, UserModel
 from src.services.users import update_avatar
 from src.services.auth import auth_service
+from src.services.caching import CachePolicy
 from src.config.settings import settings
 
 router = APIRouter(prefix="", tags=["users"])
 
-@router.get("/me/", response_model=UserDb)
+@router.get("/me/", response_model=UserDb, dependencies=[Depends(CachePolicy("user"))])
 async def read_users_me(current_user: UserModel = Depends(auth_service.get_current_user)):
     """
     Get current user's info.
@@ -1,6 +1,7 @@
 import jwt
 import pickle
 import redis
+import uuid
 
 from typing import Optional
 from datetime import datetime, timedelta
@@ -11,10 +12,13 @@ from starlette import status
 from sqlalchemy.orm import Session
 
 from src.config.settings import settings
-from src.models.db import get_db
+from src.models.db import get_read_db
 from src.models.models import User
 from src.models.schemas import UserModel
 from src.services.users import get_user_by_email
+from src.services.keys import key_ring
+from src.services.metrics import timed
+from src.services.redis_pool import get_redis
 
 
 class Auth:
@@ -26,7 +30,14 @@ class Auth:
     SECRET_KEY    = settings.jwt_secret_key
     ALGORITHM     = settings.jwt_algorithm
     TOKEN_TTL     = settings.jwt_token_ttl
-    r = redis.Redis(host=settings.redis_host, port=settings.redis_port, db=0)
+    keys          = key_ring
+
+    @property
+    def r(self) -> redis.Redis:
+        """
+        Redis client for the user cache, created on first use in the worker process
+        """
+        return get_redis()
 
     def verify_password(self, plain_password, hashed_password) -> bool:
         """
@@ -39,7 +50,8 @@ class Auth:
         Returns:
             bool: Comparison result of provided hash and calculated hash
         """
-        return self.pwd_context.verify(plain_password, hashed_password)
+        with timed("bcrypt"):
+            return self.pwd_context.verify(plain_password, hashed_password)
 
     def get_password_hash(self, password: str) -> str:
         """
@@ -51,7 +63,8 @@ class Auth:
         Returns:
             str: Hash for provided plaintext password
         """
-        return self.pwd_context.hash(password)
+        with timed("bcrypt"):
+            return self.pwd_context.hash(password)
 
     async def create_access_token(self, data: dict, expires_delta: Optional[float] = None) -> str:
         """
@@ -70,7 +83,7 @@ class Auth:
         else:
             expire = datetime.utcnow() + timedelta(minutes=self.TOKEN_TTL)
         to_encode.update({"iat": datetime.utcnow(), "exp": expire, "scope": "access_token"})
-        encoded_access_token = jwt.encode(to_encode, self.SECRET_KEY, algorithm=self.ALGORITHM)
+        encoded_access_token = self.keys.encode(to_encode)
         return encoded_access_token
 
     async def create_refresh_token(self, data: dict) -> str:
@@ -85,8 +98,9 @@ class Auth:
         """
         to_encode = data.copy()
         expire = datetime.utcnow() + timedelta(days=7)
-        to_encode.update({"iat": datetime.utcnow(), "exp": expire, "scope": "refresh_token"})
-        encoded_refresh_token = jwt.encode(to_encode, self.SECRET_KEY, algorithm=self.ALGORITHM)
+        # unique ID, so tokens issued within the same second differ and rotation can tell them apart
+        to_encode.update({"iat": datetime.utcnow(), "exp": expire, "scope": "refresh_token", "jti": uuid.uuid4().hex})
+        encoded_refresh_token = self.keys.encode(to_encode)
         return encoded_refresh_token
 
     async def get_email_from_refresh_token(self, refresh_token: str) -> str:
@@ -104,7 +118,7 @@ class Auth:
             str: User's email
         """
         try:
-            payload = jwt.decode(refresh_token, self.SECRET_KEY, algorithms=[self.ALGORITHM])
+            payload = self.keys.decode(refresh_token)
             if payload['scope'] == 'refresh_token':
                 email = payload['sub']
                 return email
@@ -115,13 +129,13 @@ class Auth:
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Could not validate credentials')
 
 
-    async def get_current_user(self, token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> User:
+    async def get_current_user(self, token: str = Depends(oauth2_scheme), db: Session = Depends(get_read_db)) -> User:
         """
         Get authenticated user onject
 
         Args:
             token (str): User's authorization token. Defaults to Depends(oauth2_scheme).
-            db (Session): Dependency injection for DB session. Defaults to Depends(get_db).
+            db (Session): Dependency injection for DB session, a replica may be used. Defaults to Depends(get_read_db).
 
         Raises:
             credentials_exception: Custom HTTPException for 401 Unauthorized.
@@ -134,7 +148,7 @@ class Auth:
                                               headers={"WWW-Authenticate": "Bearer"},)
         try:
             # Decode JWT
-            payload = jwt.decode(token, self.SECRET_KEY, algorithms=[self.ALGORITHM])
+            payload = self.keys.decode(token)
             if payload['scope'] == 'access_token':
                 email = payload["sub"]
                 if email is None:
@@ -144,14 +158,16 @@ class Auth:
         except jwt.exceptions.InvalidTokenError as e:
             raise credentials_exception
         # check cache
-        user = self.r.get(f"user:{email}")
+        with timed("redis"):
+            user = self.r.get(f"user:{email}")
         if user is None:
             user = await get_user_by_email(email, db)
             if user is None:
                 raise credentials_exception
             # write to chache
-            self.r.set(f"user:{email}", pickle.dumps(user))
-            self.r.expire(f"user:{email}", 900)
+            with timed("redis"):
+                self.r.set(f"user:{email}", pickle.dumps(user))
+                self.r.expire(f"user:{email}", 900)
         else:
             user = pickle.loads(user)
         return user
@@ -169,7 +185,7 @@ class Auth:
         to_encode = data.copy()
         expire = datetime.utcnow() + timedelta(hours=self.TOKEN_TTL)
         to_encode.update({"iat": datetime.utcnow(), "exp": expire, "scope": "email_token"})
-        email_token = jwt.encode(to_encode, self.SECRET_KEY, algorithm=self.ALGORITHM)
+        email_token = self.keys.encode(to_encode)
         return email_token
 
     async def get_email_from_token(self, token: str) -> str:
@@ -186,7 +202,7 @@ class Auth:
             str: user's emailobtained from JWT token
         """
         try:
-            payload = jwt.decode(token, self.SECRET_KEY, algorithms=[self.ALGORITHM])
+            payload = self.keys.decode(token)
             if payload['scope'] == 'email_token':
                 email = payload['sub']
                 return email
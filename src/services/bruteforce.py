@@ -0,0 +1,106 @@
+"""
+Brute-force protection of login.
+Failed attempts are counted per account and per IP address in Redis. After the free attempts every
+failure doubles the wait before the next attempt, too many account failures lock it for a while.
+The check runs before the DB lookup and bcrypt, blocked clients get 429 with Retry-After instead of
+a delayed response, so no worker time is spent on them.
+"""
+import hashlib
+import logging
+import math
+
+from src.config.settings import settings
+from src.services.redis_pool import get_async_redis
+
+
+logger = logging.getLogger(__name__)
+
+FAIL_KEY = "login:fail:{}"
+BLOCK_KEY = "login:block:{}"
+
+# KEYS: account failures, account block, IP failures, IP block
+# ARGV: window s, account free attempts, IP free attempts, base ms, max ms, lockout attempts, lockout ms
+FAILURE_SCRIPT = """local function bump(fail, block, free, lockout)
+    local count = redis.call('INCR', fail)
+    if count == 1 then
+        redis.call('EXPIRE', fail, tonumber(ARGV[1]))
+    end
+    local wait = 0
+    if lockout > 0 and count >= lockout then
+        wait = tonumber(ARGV[7])
+    elseif count > free then
+        wait = math.min(tonumber(ARGV[4]) * 2 ^ (count - free - 1), tonumber(ARGV[5]))
+    end
+    if wait > 0 then
+        redis.call('SET', block, 1, 'PX', math.floor(wait))
+    end
+    return wait
+end
+local account = bump(KEYS[1], KEYS[2], tonumber(ARGV[2]), tonumber(ARGV[6]))
+local ip = bump(KEYS[3], KEYS[4], tonumber(ARGV[3]), 0)
+return math.max(account, ip)"""
+
+
+def _keys(email: str, ip: str) -> tuple[str, str]:
+    """
+    Counter identities of the account (hashed, emails are not stored in Redis) and the IP address
+    """
+    account = "account:" + hashlib.sha1(email.strip().lower().encode()).hexdigest()
+    return account, f"ip:{ip}"
+
+
+async def retry_after(email: str, ip: str) -> int:
+    """
+    Seconds the client has to wait before the next login attempt.
+    Fails open: if Redis is unavailable login is not blocked.
+
+    Args:
+        email (str): Login email
+        ip (str): Client IP address
+
+    Returns:
+        int: 0 if the attempt is allowed
+    """
+    account, address = _keys(email, ip)
+    try:
+        pipe = get_async_redis().pipeline(transaction=False)
+        pipe.pttl(BLOCK_KEY.format(account))
+        pipe.pttl(BLOCK_KEY.format(address))
+        wait = max(await pipe.execute())
+    except Exception as err:
+        logger.warning("Login guard unavailable: %s", err)
+        return 0
+    return math.ceil(wait / 1000) if wait > 0 else 0
+
+
+async def failed(email: str, ip: str) -> None:
+    """
+    Count failed attempt and set the backoff or lockout
+
+    Args:
+        email (str): Login email, counted even if there is no such account
+        ip (str): Client IP address
+    """
+    account, address = _keys(email, ip)
+    keys = [FAIL_KEY.format(account), BLOCK_KEY.format(account), FAIL_KEY.format(address), BLOCK_KEY.format(address)]
+    args = [settings.login_fail_window, settings.login_free_attempts, settings.login_ip_free_attempts,
+            int(settings.login_backoff_base * 1000), int(settings.login_backoff_max * 1000),
+            settings.login_lockout_attempts, int(settings.login_lockout_seconds * 1000)]
+    try:
+        await get_async_redis().register_script(FAILURE_SCRIPT)(keys=keys, args=args)
+    except Exception as err:
+        logger.warning("Can't count failed login: %s", err)
+
+
+async def succeeded(email: str) -> None:
+    """
+    Reset account failures after successful login, the IP address keeps its counter
+
+    Args:
+        email (str): Login email
+    """
+    account, _ = _keys(email, "")
+    try:
+        await get_async_redis().delete(FAIL_KEY.format(account), BLOCK_KEY.format(account))
+    except Exception as err:
+        logger.warning("Can't reset failed logins: %s", err)
@@ -0,0 +1,88 @@
+"""
+HTTP caching headers.
+Routes declare a named cache policy with the `CachePolicy` dependency, the Cache-Control value of every
+policy comes from `cache_policies` setting. `CacheControlMiddleware` adds the headers to successful
+GET/HEAD responses, so it works for routes returning prepared Response objects too.
+Private policies also get `Vary: Authorization`: shared caches keep them apart per token.
+"""
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+
+from fastapi import Request, Response
+
+from src.config.settings import settings
+
+
+STATE_KEY = "cache_policy"
+CACHEABLE_STATUSES = {200, 203, 204, 206, 304}      # errors are not cached
+
+
+class CachePolicy:
+    '''
+    Dependency: mark the route response with a named cache policy
+    '''
+    def __init__(self, name: str):
+        """
+        Args:
+            name (str): Key of `cache_policies` setting, no headers are added for unknown names
+        """
+        self.name = name
+
+    async def __call__(self, request: Request) -> None:
+        value = settings.cache_policies.get(self.name)
+        if value:
+            request.state.cache_policy = value
+
+
+def not_modified(request: Request, response: Response, modified: datetime) -> bool:
+    """
+    Conditional GET: set Last-Modified header and compare it with If-Modified-Since of the request
+
+    Args:
+        request (Request): The request object
+        response (Response): Response to add Last-Modified to
+        modified (datetime): Last modification time, naive datetimes are UTC
+
+    Returns:
+        bool: True if the client copy is current and 304 Not Modified can be returned
+    """
+    if modified.tzinfo is None:
+        modified = modified.replace(tzinfo=timezone.utc)
+    modified = modified.replace(microsecond=0)
+    response.headers["Last-Modified"] = format_datetime(modified, usegmt=True)
+    since = request.headers.get("If-Modified-Since")
+    if not since or "If-None-Match" in request.headers:
+        return False
+    try:
+        since = parsedate_to_datetime(since)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    return modified <= since
+
+
+class CacheControlMiddleware:
+    '''
+    Pure ASGI middleware adding Cache-Control (and Vary) of the route policy to the response
+    '''
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in ("GET", "HEAD"):
+            return await self.app(scope, receive, send)
+
+        async def policy_send(message):
+            if message["type"] == "http.response.start" and message["status"] in CACHEABLE_STATUSES:
+                policy = scope.get("state", {}).get(STATE_KEY)
+                headers = list(message.get("headers", []))
+                names = {name.lower() for name, _ in headers}
+                if policy and b"cache-control" not in names:
+                    headers.append((b"cache-control", policy.encode("latin-1")))
+                    if "private" in policy and b"vary" not in names:
+                        headers.append((b"vary", b"Authorization"))
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        await self.app(scope, receive, policy_send)
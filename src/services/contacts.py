@@ -1,37 +1,101 @@
+import base64
+import binascii
+import logging
 from typing import List
 from datetime import date, datetime, timedelta
+
+from fastapi import HTTPException, status
+from sqlalchemy import func, Row
 from sqlalchemy.orm import Session
-from sqlalchemy.sql import extract, expression, or_
+from sqlalchemy.sql import extract, expression, or_, and_
 
+from src.config.settings import settings
+from src.models.db import SessionLocal, get_engine
 from src.models.models import Contact
-from src.models.schemas import ContactModel, UserModel, ContactResponse
+from src.models.schemas import ContactModel, UserModel, ContactResponse, ContactFilter
+from src.services import stats, events
+from src.services.normalize import normalize_phone
+from src.services.redis_pool import get_redis
+
+
+logger = logging.getLogger(__name__)
+
+# cached reverse phone lookups, user ID and E.164 number -> contact JSON or empty value for unknown numbers
+PHONE_KEY = "contacts:phone:{}:{}"
+
+SORT_FIELDS = {"id":         Contact.id,
+               "first_name": Contact.first_name,
+               "last_name":  Contact.last_name,
+               "email":      Contact.email,
+               "birthday":   Contact.birthday}
+
+# columns of ContactResponse: list reads select them as plain rows instead of hydrating ORM objects
+READ_COLUMNS = (Contact.id, Contact.first_name, Contact.last_name, Contact.email,
+                Contact.phone, Contact.birthday, Contact.notes)
+FIELD_COLUMNS = {column.key: column for column in READ_COLUMNS}
+# fields of ?fields=summary: the contact without the unbounded notes
+SUMMARY_FIELDS = ("id", "first_name", "last_name", "email", "phone")
 
-async def get_contacts(skip: int, limit: int, db: Session) -> List[Contact]:
+# deleted contacts are kept as tombstones for the change feed and are never returned by other reads
+ACTIVE = Contact.deleted_at.is_(None)
+
+def select_columns(fields: str | None) -> tuple:
     """
-    Get contacts from the database.
+    Columns for a sparse fieldset. ID is always selected.
+
+    Args:
+        fields (str | None): Comma separated field names, "summary" or None for all fields
+
+    Raises:
+        ValueError: unknown field name
+
+    Returns:
+        tuple: SQLAlchemy columns
+    """
+    if not fields:
+        return READ_COLUMNS
+    names = SUMMARY_FIELDS if fields == "summary" else [name.strip() for name in fields.split(",")]
+    unknown = [name for name in names if name not in FIELD_COLUMNS]
+    if unknown:
+        raise ValueError(f"unknown fields: {', '.join(unknown)}")
+    return tuple(column for name, column in FIELD_COLUMNS.items() if name == "id" or name in names)
+
+async def get_contacts(skip: int, limit: int, db: Session, current_user: UserModel,
+                       columns: tuple = READ_COLUMNS) -> List[Row]:
+    """
+    Get user's contacts from the database.
 
     Args:
         skip (int): Number of contacts from start to be skipped.
         limit (int): Number of contacts to be returned.
         db (Session): Database session
+        current_user (User): Owner of the contacts
+        columns (tuple): Columns to select, see select_columns. Defaults to READ_COLUMNS.
 
     Returns:
-        List[Contact]: List of contacts
+        List[Row]: List of contacts as rows of the columns
+    """
+    return contact_rows(skip, limit, db, current_user.id, columns)
+
+def contact_rows(skip: int, limit: int, db: Session, user_id: int, columns: tuple = READ_COLUMNS) -> List[Row]:
+    """
+    Blocking body of get_contacts, to run in a worker thread
     """
-    return db.query(Contact).offset(skip).limit(limit).all()
+    return db.query(*columns).filter(Contact.user_id == user_id, ACTIVE).offset(skip).limit(limit).all()
 
-async def get_contact(contact_id: int, db: Session) -> ContactResponse | None:
+async def get_contact(contact_id: int, db: Session, current_user: UserModel) -> ContactResponse | None:
     """
-    Get contact from the database by contact ID
+    Get user's contact from the database by contact ID
 
     Args:
         contact_id (int): Contact ID
         db (Session): Database session
+        current_user (User): Owner of the contact
 
     Returns:
         ContactResponse: Contact object from DB or None if not found
     """
-    return db.query(Contact).filter(Contact.id == contact_id).first()
+    return db.query(Contact).filter(Contact.user_id == current_user.id, Contact.id == contact_id, ACTIVE).first()
 
 async def create_contact(body: ContactModel, db: Session, current_user: UserModel) -> ContactResponse:
     """
@@ -45,10 +109,11 @@ async def create_contact(body: ContactModel, db: Session, current_user: UserMode
     Returns:
         ContactResponse: Contact object
     """
-    contact = Contact(first_name=body.first_name.capitalize(), 
-                      last_name=body.last_name.capitalize(), 
+    contact = Contact(first_name=body.first_name.strip(), 
+                      last_name=body.last_name.strip(), 
                       email=body.email.lower(),
                       phone=body.phone,
+                      phone_e164=normalize_phone(body.phone),
                       birthday=body.birthday,
                       notes=body.notes,
                       user_id=current_user.id
@@ -56,6 +121,8 @@ async def create_contact(body: ContactModel, db: Session, current_user: UserMode
     db.add(contact)
     db.commit()
     db.refresh(contact)
+    stats.contact_added(contact)
+    contact_changed("created", contact)
     return contact
 
 async def update_contact(contact_id: int, body: ContactModel, db: Session, current_user: UserModel) -> ContactResponse:
@@ -68,74 +135,185 @@ async def update_contact(contact_id: int, body: ContactModel, db: Session, curre
         db (Session): Database session
         current_user (User): Current user associated with this contact entry
     Returns:
-        ContactResponse: Contact object
+        ContactResponse: Contact object, None if the user has no such contact
     """
-    contact = db.query(Contact).filter(Contact.id == contact_id).first()
+    contact = db.query(Contact).filter(Contact.user_id == current_user.id, Contact.id == contact_id, ACTIVE).first()
     if contact:
-        contact.first_name = body.first_name.capitalize()
-        contact.last_name = body.last_name.capitalize()
+        old_month, old_number = contact.birthday.month, contact.phone_e164
+        contact.first_name = body.first_name.strip()
+        contact.last_name = body.last_name.strip()
         contact.email = body.email.lower()
         contact.phone = body.phone
+        contact.phone_e164 = normalize_phone(body.phone)
         contact.birthday = body.birthday
         contact.notes = body.notes
-        contact.used_id = current_user.id
         db.commit()
-    db.refresh(contact)
+        stats.birthday_changed(contact.user_id, old_month, body.birthday.month)
+        db.refresh(contact)
+        forget_phones(contact.user_id, old_number)
+        contact_changed("updated", contact)
     return contact
 
-async def delete_contact(contact_id: int, db: Session) -> ContactResponse | None:
+async def delete_contact(contact_id: int, db: Session, current_user: UserModel) -> ContactResponse | None:
     """
-    Delete contact entry from the database
+    Delete contact entry from the database.
+    The row is kept as a tombstone, so the change feed reports the deletion to syncing clients.
+
+    Args:
+        contact_id (int): Contact id
+        db (Session): Database session
+        current_user (User): Owner of the contact
 
     Returns:
         ContactResponse: Contact object from DB or None if contact did not exist
     """
-    contact = db.query(Contact).filter(Contact.id == contact_id).first()
+    contact = db.query(Contact).filter(Contact.user_id == current_user.id, Contact.id == contact_id, ACTIVE).first()
     if contact:
-        db.delete(contact)
+        contact.deleted_at = contact.updated_at = datetime.utcnow()
         db.commit()
+        stats.contact_removed(contact)
+        contact_changed("deleted", contact)
     return contact
 
-async def find_contacts(first_name: str, 
-                        last_name: str,
-                        email: str, 
-                        db: Session
-                        ) -> List[ContactResponse]:
+def contact_changed(event: str, contact: Contact) -> None:
+    """
+    Hooks of a committed change: drop cached phone lookup and push the change to the owner's connected clients
+
+    Args:
+        event (str): "created", "updated" or "deleted"
+        contact (Contact): Changed contact
+    """
+    forget_phones(contact.user_id, contact.phone_e164)
+    events.publish(event, contact, encode_cursor(contact.updated_at, contact.id))
+
+def forget_phones(user_id: int, *numbers: str | None) -> None:
+    """
+    Invalidate cached phone lookups of the user
+
+    Args:
+        user_id (int): User ID
+        numbers (str | None): E.164 numbers
+    """
+    keys = [PHONE_KEY.format(user_id, number) for number in numbers if number]
+    if not keys:
+        return
+    try:
+        get_redis().delete(*keys)
+    except Exception as err:
+        logger.warning("Can't invalidate phone lookup cache of user %s: %s", user_id, err)
+
+async def lookup_phone(phone: str, db: Session, current_user: UserModel) -> bytes | None:
     """
-    Search the database fro the user on a given criterion.
-    Only first existing parameter will be evaluated.
+    Caller ID: find the user's contact by phone number in any format, using the E.164 index.
+    Answers, including "unknown number", are cached in Redis until the contact changes.
 
     Args:
-        first_name (str): User first name
-        last_name (str): User last name 
-        email (str): User email
+        phone (str): Phone number
         db (Session): Database session
+        current_user (User): Owner of the contacts
 
     Returns:
-        List[Contact]: List of contacts found by the search criterion
+        bytes | None: ContactResponse JSON, None if no contact has the number
     """
-    if first_name:
-        contacts = db.query(Contact).filter(Contact.first_name == first_name.capitalize()).all()
-    elif last_name:
-        contacts = db.query(Contact).filter(Contact.last_name == last_name.capitalize()).all()
-    elif email:
-        contacts = db.query(Contact).filter(Contact.email == email.lower()).all()
+    number = normalize_phone(phone)
+    if number is None:
+        return None
+    key = PHONE_KEY.format(current_user.id, number)
+    try:
+        cached = get_redis().get(key)
+        if cached is not None:
+            return cached or None
+    except Exception as err:
+        logger.warning("Can't read phone lookup cache: %s", err)
+    row = db.query(*READ_COLUMNS).filter(Contact.user_id == current_user.id, Contact.phone_e164 == number, ACTIVE) \
+            .order_by(Contact.id).first()
+    found = ContactResponse.model_construct(**row._mapping).model_dump_json().encode() if row else b""
+    try:
+        get_redis().set(key, found, ex=settings.phone_cache_ttl if found else settings.phone_miss_ttl)
+    except Exception as err:
+        logger.warning("Can't cache phone lookup: %s", err)
+    return found or None
 
-    else:
-        contacts = None
-    return  contacts
+def contact_filters(criteria: ContactFilter) -> list:
+    """
+    Build SQL predicates for given criteria, the planner picks the index whatever their order.
+    Names are compared case-insensitive with lower() indexes, emails are stored lowercased,
+    phones are compared in E.164 form, so any spelling of the number matches.
+
+    Args:
+        criteria (ContactFilter): Search criteria
+
+    Returns:
+        list: SQLAlchemy predicates
+    """
+    predicates = []
+    if criteria.email:
+        predicates.append(Contact.email == criteria.email.lower())
+    if criteria.phone:
+        number = normalize_phone(criteria.phone)
+        # numbers that can't be normalized are stored as typed only
+        predicates.append(Contact.phone_e164 == number if number else Contact.phone == criteria.phone)
+    if criteria.first_name:
+        predicates.append(func.lower(Contact.first_name) == criteria.first_name.lower())
+    if criteria.last_name:
+        predicates.append(func.lower(Contact.last_name) == criteria.last_name.lower())
+    if criteria.birthday_from and criteria.birthday_to:
+        predicates.append(Contact.birthday.between(criteria.birthday_from, criteria.birthday_to))
+    elif criteria.birthday_from:
+        predicates.append(Contact.birthday >= criteria.birthday_from)
+    elif criteria.birthday_to:
+        predicates.append(Contact.birthday <= criteria.birthday_to)
+    if criteria.notes:
+        predicates.append(Contact.notes.contains(criteria.notes, autoescape=True))
+    return predicates
+
+async def find_contacts(criteria: ContactFilter, db: Session, current_user: UserModel,
+                        columns: tuple = READ_COLUMNS) -> List[Row] | None:
+    """
+    Search the user's contacts matching all (or any) of the given criteria with one query.
+    Result size is capped by `contacts_query_max_limit` setting.
+
+    Args:
+        criteria (ContactFilter): Search criteria, sort order and limit
+        db (Session): Database session
+        current_user (User): Owner of the contacts
+        columns (tuple): Columns to select, see select_columns. Defaults to READ_COLUMNS.
+
+    Returns:
+        List[Row]: List of contacts found as rows of the columns, None if no criteria given
+    """
+    predicates = contact_filters(criteria)
+    if not predicates:
+        return None
+    clause = and_(*predicates) if criteria.match == "all" else or_(*predicates)
+    column = SORT_FIELDS[criteria.sort.lstrip("-")]
+    order = column.desc() if criteria.sort.startswith("-") else column.asc()
+    limit = min(criteria.limit, settings.contacts_query_max_limit)
+    return db.query(*columns).filter(Contact.user_id == current_user.id, ACTIVE, clause) \
+             .order_by(order, Contact.id).limit(limit).all()
     
-async def find_contacts_with_birthdays(days: int, include_today: bool, db: Session) -> List[ContactResponse]:
+async def find_contacts_with_birthdays(days: int, include_today: bool, db: Session, current_user: UserModel,
+                                      columns: tuple = READ_COLUMNS) -> List[Row]:
     """
-    Get contacts from the database, whose birthdays are in next 'days' days.
+    Get user's contacts from the database, whose birthdays are in next 'days' days.
 
     Args:
         days (int): Number of days from today.
         include_today (bool): Include today or not.
         db (Session): Database session
+        current_user (User): Owner of the contacts
+        columns (tuple): Columns to select, see select_columns. Defaults to READ_COLUMNS.
 
     Returns:
-        List[Contact]: list of contacts that have birthday in next 'days' days
+        List[Row]: list of contacts that have birthday in next 'days' days, rows of the columns
+    """
+    return birthday_rows(days, include_today, db, current_user.id, columns)
+
+
+def birthday_rows(days: int, include_today: bool, db: Session, user_id: int,
+                  columns: tuple = READ_COLUMNS) -> List[Row]:
+    """
+    Blocking body of find_contacts_with_birthdays, to run in a worker thread
     """
     today_doy = datetime.today().timetuple().tm_yday        # doy = Day Of Year
 
@@ -148,11 +326,104 @@ async def find_contacts_with_birthdays(days: int, include_today: bool, db: Sessi
         start_doy = leap_delta
         next_doy -= days_per_year
 
-    contacts = db.query(Contact).filter(or_(
+    contacts = db.query(*columns).filter(Contact.user_id == user_id, ACTIVE, or_(
         expression.between(extract('doy', Contact.birthday), start_doy - include_today, next_doy-1),        # -1 because "between" includes end date
         expression.between(extract('doy', Contact.birthday), today_doy - include_today, today_doy+days-1),
         )).all()
 
 
 
-    return  contacts
\ No newline at end of file
+    return  contacts
+
+
+def encode_cursor(updated_at: datetime, contact_id: int) -> str:
+    """
+    Make opaque change feed cursor
+
+    Args:
+        updated_at (datetime): Modification time of the last seen contact
+        contact_id (int): ID of the last seen contact
+
+    Returns:
+        str: cursor
+    """
+    return base64.urlsafe_b64encode(f"{updated_at.isoformat()}|{contact_id}".encode()).decode()
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    """
+    Parse change feed cursor
+
+    Args:
+        cursor (str): Cursor returned by the change feed
+
+    Raises:
+        ValueError: malformed cursor
+
+    Returns:
+        tuple[datetime, int]: modification time and ID of the last seen contact
+    """
+    try:
+        updated_at, contact_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(updated_at), int(contact_id)
+    except (binascii.Error, UnicodeError, ValueError) as err:
+        raise ValueError(f"invalid cursor: {cursor}") from err
+
+
+async def get_changes(since: str | None, limit: int, db: Session, current_user: UserModel) -> dict:
+    """
+    Get the user's contacts created, updated or deleted after the cursor, ordered by (updated_at, id).
+    Without a cursor returns the whole address book, tombstones excluded.
+    Rows changed during the last `changes_settle_seconds` are held back, so transactions still in flight
+    with an earlier timestamp are not skipped by the cursor.
+
+    Args:
+        since (str | None): Cursor from the previous response
+        limit (int): Max number of changes, capped by `contacts_query_max_limit` setting
+        db (Session): Database session, must be the primary
+        current_user (User): Owner of the contacts
+
+    Raises:
+        HTTPException: 400 BadRequest - malformed cursor
+        HTTPException: 410 Gone - cursor is older than tombstones retention, full sync required
+
+    Returns:
+        dict: changes, cursor for the next call and whether more changes are waiting
+    """
+    now = datetime.utcnow()
+    settled = now - timedelta(seconds=settings.changes_settle_seconds)
+    query = db.query(Contact).filter(Contact.user_id == current_user.id, Contact.updated_at <= settled)
+    if since:
+        try:
+            last_updated, last_id = decode_cursor(since)
+        except ValueError as err:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(err))
+        if last_updated < now - timedelta(days=settings.contacts_tombstone_days):
+            raise HTTPException(status_code=status.HTTP_410_GONE, detail="Cursor expired, full sync required")
+        query = query.filter(or_(Contact.updated_at > last_updated,
+                                 and_(Contact.updated_at == last_updated, Contact.id > last_id)))
+    else:
+        query = query.filter(ACTIVE)
+    limit = min(limit, settings.contacts_query_max_limit)
+    changes = query.order_by(Contact.updated_at, Contact.id).limit(limit + 1).all()
+    has_more = len(changes) > limit
+    changes = changes[:limit]
+    if changes:
+        cursor = encode_cursor(changes[-1].updated_at, changes[-1].id)
+    else:
+        cursor = since or encode_cursor(settled, 0)
+    return {"changes": changes, "cursor": cursor, "has_more": has_more}
+
+
+def purge_tombstones() -> int:
+    """
+    Periodic job: remove contacts deleted more than `contacts_tombstone_days` ago
+
+    Returns:
+        int: Number of rows removed
+    """
+    expired = datetime.utcnow() - timedelta(days=settings.contacts_tombstone_days)
+    with SessionLocal(bind=get_engine()) as db:
+        removed = db.query(Contact).filter(Contact.deleted_at < expired).delete(synchronize_session=False)
+        db.commit()
+    return removed
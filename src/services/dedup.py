@@ -0,0 +1,238 @@
+"""
+Contact deduplication.
+Contacts of a user are loaded once as column rows, grouped into blocks by hashed keys
+(normalized email, E.164 phone, name keys) and only pairs inside a block are scored,
+so the batch stays close to linear instead of comparing every pair.
+"""
+import difflib
+import hashlib
+import itertools
+import logging
+from datetime import datetime
+
+from sqlalchemy.orm import Session
+
+from src.config.settings import settings
+from src.models.db import SessionLocal, get_engine
+from src.models.models import Contact
+from src.models.schemas import UserModel
+from src.services import contacts, stats
+from src.services.normalize import normalize_phone, normalize_email, normalize_name, name_key
+
+
+logger = logging.getLogger(__name__)
+
+DEDUP_COLUMNS = (Contact.id, Contact.first_name, Contact.last_name, Contact.email,
+                 Contact.phone, Contact.phone_e164, Contact.birthday)
+
+
+def _hash(key: str) -> bytes:
+    return hashlib.blake2b(key.encode(), digest_size=8).digest()
+
+
+def prepare(row) -> dict:
+    """
+    Normalize contact attributes once before blocking and scoring
+
+    Args:
+        row (Row): Row of DEDUP_COLUMNS
+
+    Returns:
+        dict: id, normalized email, phone and full name, birthday and blocking keys
+    """
+    email = normalize_email(row.email)
+    phone = row.phone_e164 or normalize_phone(row.phone) or row.phone
+    # the same last name and birthday block catches nicknames ("Bob", "Robert")
+    keys = {_hash(f"e:{email}"), _hash(f"p:{phone}"), _hash(f"n:{name_key(row.first_name, row.last_name)}"),
+            _hash(f"b:{normalize_name(row.last_name)}:{row.birthday}")}
+    return {"id": row.id,
+            "email": email,
+            "phone": phone,
+            "name": f"{normalize_name(row.first_name)} {normalize_name(row.last_name)}",
+            "birthday": row.birthday,
+            "keys": keys}
+
+
+def score_pair(a: dict, b: dict) -> tuple[float, list[str]]:
+    """
+    Duplicate score of two prepared contacts: same email or phone is the main signal,
+    name similarity and the same birthday add to it
+
+    Args:
+        a (dict): Prepared contact
+        b (dict): Prepared contact
+
+    Returns:
+        tuple[float, list[str]]: score 0..1 and matched signals
+    """
+    same_email = a["email"] == b["email"]
+    same_phone = a["phone"] == b["phone"]
+    same_birthday = a["birthday"] == b["birthday"]
+    similarity = difflib.SequenceMatcher(None, a["name"], b["name"]).ratio()
+    score = 0.5 * (same_email or same_phone) + 0.2 * (same_email and same_phone) \
+            + 0.3 * similarity + 0.2 * same_birthday
+    reasons = [name for name, matched in (("email", same_email), ("phone", same_phone),
+                                          ("name", similarity >= 0.8), ("birthday", same_birthday)) if matched]
+    return round(min(score, 1.0), 3), reasons
+
+
+def find_duplicates(rows, min_score: float) -> list[dict]:
+    """
+    Score candidate pairs that share a blocking key
+
+    Args:
+        rows (Iterable): Rows of DEDUP_COLUMNS
+        min_score (float): Lowest score to report
+
+    Returns:
+        list[dict]: pairs of contact IDs with score and matched signals, best first
+    """
+    prepared = [prepare(row) for row in rows]
+    blocks = {}
+    for contact in prepared:
+        for key in contact["keys"]:
+            blocks.setdefault(key, []).append(contact)
+    seen = set()
+    pairs = []
+    for block in blocks.values():
+        if len(block) > settings.dedup_block_max:
+            # too common a key (shared office phone, frequent surname) - other keys still match real duplicates
+            continue
+        for a, b in itertools.combinations(block, 2):
+            pair = (min(a["id"], b["id"]), max(a["id"], b["id"]))
+            if pair in seen:
+                continue
+            seen.add(pair)
+            score, reasons = score_pair(a, b)
+            if score >= min_score:
+                pairs.append({"contact_ids": list(pair), "score": score, "reasons": reasons})
+    pairs.sort(key=lambda pair: (-pair["score"], pair["contact_ids"]))
+    return pairs
+
+
+def _user_rows(db: Session, user_id: int) -> list:
+    return db.query(*DEDUP_COLUMNS).filter(Contact.user_id == user_id, contacts.ACTIVE).all()
+
+
+async def get_duplicates(db: Session, current_user: UserModel) -> list[dict]:
+    """
+    Merge suggestions for the user's contacts
+
+    Args:
+        db (Session): Database session
+        current_user (User): Owner of the contacts
+
+    Returns:
+        list[dict]: pairs of contact IDs scoring at least `dedup_suggest_score`
+    """
+    return find_duplicates(_user_rows(db, current_user.id), settings.dedup_suggest_score)
+
+
+def _merge(db: Session, keep: Contact, duplicates: list[Contact]) -> None:
+    """
+    Append notes of the duplicates to the kept contact and delete them.
+    Changes are committed by the caller, then `_merged` runs the hooks.
+    """
+    now = datetime.utcnow()
+    notes = [keep.notes] if keep.notes else []
+    for duplicate in duplicates:
+        if duplicate.notes and duplicate.notes not in notes:
+            notes.append(duplicate.notes)
+        duplicate.deleted_at = duplicate.updated_at = now
+    keep.notes = "\n".join(notes)
+    keep.updated_at = now
+
+
+def _merged(keep: Contact, duplicates: list[Contact]) -> None:
+    # stats and push events of a committed merge
+    for duplicate in duplicates:
+        stats.contact_removed(duplicate)
+        contacts.contact_changed("deleted", duplicate)
+    contacts.contact_changed("updated", keep)
+
+
+async def merge_contacts(keep_id: int, duplicate_ids: list[int], db: Session, current_user: UserModel) -> Contact | None:
+    """
+    Merge duplicates into one contact of the user
+
+    Args:
+        keep_id (int): ID of the contact to keep
+        duplicate_ids (list[int]): IDs of the contacts to merge into it, they are deleted
+        db (Session): Database session
+        current_user (User): Owner of the contacts
+
+    Returns:
+        Contact | None: kept contact, None if any of the contacts is not found
+    """
+    ids = {keep_id, *duplicate_ids}
+    found = db.query(Contact).filter(Contact.id.in_(ids), Contact.user_id == current_user.id, contacts.ACTIVE).all()
+    if len(found) != len(ids):
+        return None
+    keep = next(contact for contact in found if contact.id == keep_id)
+    duplicates = [contact for contact in found if contact.id != keep_id]
+    _merge(db, keep, duplicates)
+    db.commit()
+    db.refresh(keep)
+    _merged(keep, duplicates)
+    return keep
+
+
+def _groups(pairs: list[dict]) -> list[list[int]]:
+    """
+    Merge groups of paired contact IDs: the oldest unmerged contact is kept and takes the contacts
+    paired with it directly. Pairs are not chained: A~B and B~C don't merge A and C, they may be different people.
+
+    Returns:
+        list[list[int]]: kept contact ID followed by its duplicates
+    """
+    paired = {}
+    for a, b in (pair["contact_ids"] for pair in pairs):
+        paired.setdefault(a, set()).add(b)
+        paired.setdefault(b, set()).add(a)
+    taken = set()
+    groups = []
+    for keep in sorted(paired):
+        if keep in taken:
+            continue
+        duplicates = sorted(paired[keep] - taken)
+        if duplicates:
+            taken.update(duplicates, [keep])
+            groups.append([keep, *duplicates])
+    return groups
+
+
+def auto_merge() -> int:
+    """
+    Periodic job: merge contacts scoring at least `dedup_merge_score` for every user, one transaction per user.
+    Every merged contact scores at least that against the kept one, the oldest of a group.
+
+    Returns:
+        int: Number of contacts merged into others
+    """
+    merged = 0
+    with SessionLocal(bind=get_engine()) as db:
+        user_ids = [user_id for (user_id,) in db.query(Contact.user_id).filter(contacts.ACTIVE).distinct()
+                    if user_id is not None]
+    for user_id in user_ids:
+        # a session per user: loaded contacts are released after the user's transaction,
+        # merged objects are read by the hooks after commit, do not reload them one by one
+        with SessionLocal(bind=get_engine(), expire_on_commit=False) as db:
+            pairs = find_duplicates(_user_rows(db, user_id), settings.dedup_merge_score)
+            if not pairs:
+                continue
+            groups = _groups(pairs)
+            loaded = {contact.id: contact for contact in
+                      db.query(Contact).filter(Contact.user_id == user_id,
+                                               Contact.id.in_([i for group in groups for i in group])).all()}
+            done = []
+            for keep_id, *duplicate_ids in groups:
+                keep, duplicates = loaded[keep_id], [loaded[i] for i in duplicate_ids]
+                _merge(db, keep, duplicates)
+                done.append((keep, duplicates))
+            db.commit()
+        for keep, duplicates in done:
+            _merged(keep, duplicates)
+            merged += len(duplicates)
+    if merged:
+        logger.info("Auto-merged %d duplicate contacts", merged)
+    return merged
@@ -1,3 +1,4 @@
+from functools import lru_cache
 from pathlib import Path
 from fastapi import FastAPI, BackgroundTasks
 from fastapi_mail import FastMail, MessageSchema, ConnectionConfig, MessageType
@@ -6,21 +7,31 @@ from typing import List
 
 from src.config.settings import settings
 from src.services.auth import auth_service
+from src.services.resources import resources
 
-conf = ConnectionConfig(
-    MAIL_USERNAME   = settings.mail_username,
-    MAIL_PASSWORD   = settings.mail_password,
-    MAIL_FROM       = settings.mail_from,
-    MAIL_PORT       = settings.mail_port,
-    MAIL_SERVER     = settings.mail_server,
-    MAIL_FROM_NAME  = settings.mail_from_name,
-    MAIL_STARTTLS   = settings.mail_starttls,
-    MAIL_SSL_TLS    = settings.mail_ssl_tls,
-    USE_CREDENTIALS = settings.mail_use_credentials,
-    VALIDATE_CERTS  = settings.mail_validate_certs,
-    TEMPLATE_FOLDER = Path(__file__).parent / 'templates',
-)
+@lru_cache
+def get_mail_config() -> ConnectionConfig:
+    """
+    Mail connection config, built on first use
+
+    Returns:
+        ConnectionConfig: fastapi-mail connection config
+    """
+    return ConnectionConfig(
+        MAIL_USERNAME   = settings.mail_username,
+        MAIL_PASSWORD   = settings.mail_password,
+        MAIL_FROM       = settings.mail_from,
+        MAIL_PORT       = settings.mail_port,
+        MAIL_SERVER     = settings.mail_server,
+        MAIL_FROM_NAME  = settings.mail_from_name,
+        MAIL_STARTTLS   = settings.mail_starttls,
+        MAIL_SSL_TLS    = settings.mail_ssl_tls,
+        USE_CREDENTIALS = settings.mail_use_credentials,
+        VALIDATE_CERTS  = settings.mail_validate_certs,
+        TEMPLATE_FOLDER = Path(__file__).parent / 'templates',
+    )
 
+@resources.tracked
 async def send_email(email: EmailStr, username: str, host: str) -> None:
     """
     Send email to the user.
@@ -38,7 +49,7 @@ async def send_email(email: EmailStr, username: str, host: str) -> None:
             template_body={"host": host, "username": username, "token": token_verification},
             subtype=MessageType.html
         )
-        fm = FastMail(conf)
+        fm = FastMail(get_mail_config())
         await fm.send_message(message, template_name="confirmatilon_email_template.html")
     except ConnectionError as connErr:
         print(connErr)
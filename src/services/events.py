@@ -0,0 +1,151 @@
+"""
+Contact change events pushed to connected clients.
+Services publish to a per-user Redis channel, every worker holds one pattern subscription
+and fans the events out to the queues of its local subscribers (server-sent events connections).
+"""
+import asyncio
+import json
+import logging
+from contextlib import asynccontextmanager
+
+from src.config.settings import settings
+from src.models.models import Contact
+from src.services.redis_pool import get_redis, get_async_redis
+
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "contacts:events:{}"
+
+# sent when events may have been lost, clients catch up with the change feed
+RESYNC = {"event": "resync"}
+
+
+def _payload(event: str, contact: Contact, cursor: str) -> dict:
+    """
+    Event body: contact attributes and the change feed cursor of the change
+    """
+    return {"event": event,
+            "cursor": cursor,
+            "contact": {"id": contact.id,
+                        "first_name": contact.first_name,
+                        "last_name": contact.last_name,
+                        "email": contact.email,
+                        "phone": contact.phone,
+                        "birthday": contact.birthday.isoformat(),
+                        "notes": contact.notes,
+                        "updated_at": contact.updated_at.isoformat(),
+                        "deleted_at": contact.deleted_at.isoformat() if contact.deleted_at else None}}
+
+
+def publish(event: str, contact: Contact, cursor: str) -> None:
+    """
+    Publish contact change to the owner's channel. Failures are logged, the change feed still has it.
+
+    Args:
+        event (str): "created", "updated" or "deleted"
+        contact (Contact): Changed contact
+        cursor (str): Change feed cursor of the change
+    """
+    if contact.user_id is None:
+        return
+    try:
+        get_redis().publish(CHANNEL.format(contact.user_id), json.dumps(_payload(event, contact, cursor)))
+    except Exception as err:
+        logger.warning("Can't publish %s event of contact %s: %s", event, contact.id, err)
+
+
+class EventHub:
+    '''
+    Per-worker fan-out of Redis events to local subscribers
+    '''
+    def __init__(self):
+        self.subscribers: dict[int, set[asyncio.Queue]] = {}
+        self._listener: asyncio.Task | None = None
+
+    @asynccontextmanager
+    async def subscribe(self, user_id: int):
+        """
+        Receive events of the user while the context is open.
+        The worker's Redis subscription is started with the first subscriber.
+
+        Args:
+            user_id (int): User ID
+
+        Yields:
+            asyncio.Queue: queue of event dicts
+        """
+        if self._listener is None or self._listener.done():
+            self._listener = asyncio.create_task(self._listen())
+        queue = asyncio.Queue(maxsize=settings.events_queue_size)
+        self.subscribers.setdefault(user_id, set()).add(queue)
+        try:
+            yield queue
+        finally:
+            queues = self.subscribers.get(user_id, set())
+            queues.discard(queue)
+            if not queues:
+                self.subscribers.pop(user_id, None)
+
+    def dispatch(self, channel: str, data: str) -> None:
+        """
+        Put event to the queues of the channel's subscribers.
+        A subscriber that does not keep up loses its backlog and gets a resync event instead.
+
+        Args:
+            channel (str): Redis channel
+            data (str): JSON event
+        """
+        user_id = int(channel.rsplit(":", 1)[1])
+        queues = self.subscribers.get(user_id)
+        if not queues:
+            return
+        event = json.loads(data)
+        for queue in queues:
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                self._resync(queue)
+
+    @staticmethod
+    def _resync(queue: asyncio.Queue) -> None:
+        while not queue.empty():
+            queue.get_nowait()
+        queue.put_nowait(RESYNC)
+
+    async def _listen(self) -> None:
+        """
+        Pattern-subscribe to all users' channels, reconnect after Redis errors
+        """
+        while True:
+            pubsub = get_async_redis().pubsub()
+            try:
+                await pubsub.psubscribe(CHANNEL.format("*"))
+                async for message in pubsub.listen():
+                    if message["type"] == "pmessage":
+                        self.dispatch(message["channel"], message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as err:
+                logger.warning("Contact events subscription lost: %s", err)
+                for queues in self.subscribers.values():
+                    for queue in queues:
+                        self._resync(queue)
+                await asyncio.sleep(1)
+            finally:
+                await pubsub.aclose()
+
+    async def close(self) -> None:
+        """
+        Stop the Redis subscription
+        """
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._listener = None
+
+
+event_hub = EventHub()
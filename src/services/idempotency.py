@@ -0,0 +1,130 @@
+"""
+Idempotency-Key support for non-idempotent POST routes.
+The first request with a key runs under a Redis lock, its final outcome (success or a client error
+that a retry would get again) is stored for `idempotency_ttl` and replayed to retries with the same key
+and body. Concurrent duplicates get 409 while it runs.
+"""
+import base64
+import hashlib
+import json
+import logging
+
+from fastapi import Request
+
+from src.config.settings import settings
+from src.services.ratelimit import RateLimit
+from src.services.redis_pool import get_async_redis
+
+
+logger = logging.getLogger(__name__)
+
+KEY = "idempotency:{}"
+MAX_STORED_BODY = 1024 * 1024
+# client errors a retry gets again, others (401, 403, 408, 425, 429...) can pass on a retry
+STORED_CLIENT_ERRORS = {400, 409, 422}
+
+
+class IdempotencyMiddleware:
+    '''
+    Pure ASGI middleware, so the request body can be fingerprinted and the response recorded while it is streamed
+    '''
+    def __init__(self, app):
+        self.app = app
+
+    def applies(self, scope) -> bool:
+        return scope["type"] == "http" and scope["method"] == "POST" and scope["path"] in settings.idempotency_paths
+
+    @staticmethod
+    def storage_key(scope, key: str) -> str:
+        """
+        Keys are scoped by the client (token subject or IP address, as the rate limiter sees it) and the path,
+        so a retry with a refreshed access token finds the stored response
+        """
+        client, _ = RateLimit.identify(Request(scope))
+        return KEY.format(hashlib.sha256(f"{client}|{scope['path']}|{key}".encode()).hexdigest())
+
+    @staticmethod
+    def final(status: int) -> bool:
+        """
+        Whether the response is the final outcome of the request, to be replayed to retries
+        """
+        return 200 <= status < 300 or status in STORED_CLIENT_ERRORS
+
+    @staticmethod
+    async def respond(send, status: int, body: bytes, headers: list | None = None) -> None:
+        await send({"type": "http.response.start", "status": status,
+                    "headers": [(b"content-type", b"application/json"), *(headers or [])]})
+        await send({"type": "http.response.body", "body": body})
+
+    async def __call__(self, scope, receive, send):
+        if not self.applies(scope):
+            return await self.app(scope, receive, send)
+        key = dict(scope["headers"]).get(b"idempotency-key")
+        if not key:
+            return await self.app(scope, receive, send)
+        if len(key) > 255:
+            return await self.respond(send, 400, b'{"detail":"Idempotency-Key is too long"}')
+
+        chunks, more = [], True
+        while more:
+            message = await receive()
+            chunks.append(message.get("body", b""))
+            more = message.get("more_body", False)
+        body = b"".join(chunks)
+        fingerprint = hashlib.sha256(body).hexdigest()
+        storage_key = self.storage_key(scope, key.decode("latin-1"))
+        lock_key = storage_key + ":lock"
+
+        async def replay_receive():
+            nonlocal body
+            if body is None:
+                return await receive()
+            message, body = {"type": "http.request", "body": body, "more_body": False}, None
+            return message
+
+        redis = get_async_redis()
+        try:
+            stored = await redis.get(storage_key)
+            locked = stored is None and await redis.set(lock_key, 1, nx=True, px=int(settings.idempotency_lock_seconds * 1000))
+        except Exception as err:
+            # Redis is down: serve the request without protection rather than failing it
+            logger.warning("Idempotency store unavailable: %s", err)
+            return await self.app(scope, replay_receive, send)
+
+        if stored is not None:
+            stored = json.loads(stored)
+            if stored["fingerprint"] != fingerprint:
+                return await self.respond(send, 422, b'{"detail":"Idempotency-Key was used with a different request"}')
+            headers = [(name.encode("latin-1"), value.encode("latin-1")) for name, value in stored["headers"]]
+            await send({"type": "http.response.start", "status": stored["status"],
+                        "headers": [*headers, (b"idempotent-replayed", b"true")]})
+            await send({"type": "http.response.body", "body": base64.b64decode(stored["body"])})
+            return
+        if not locked:
+            return await self.respond(send, 409, b'{"detail":"A request with this Idempotency-Key is in progress"}',
+                                      [(b"retry-after", b"1")])
+
+        response = {"status": 500, "headers": [], "body": []}
+
+        async def recording_send(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+                response["headers"] = [(name.decode("latin-1"), value.decode("latin-1"))
+                                       for name, value in message.get("headers", [])]
+            elif message["type"] == "http.response.body":
+                response["body"].append(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, replay_receive, recording_send)
+        finally:
+            try:
+                response_body = b"".join(response["body"])
+                # server errors, auth failures and throttling are not stored, the retry may succeed
+                if self.final(response["status"]) and len(response_body) <= MAX_STORED_BODY:
+                    record = {"fingerprint": fingerprint, "status": response["status"], "headers": response["headers"],
+                              "body": base64.b64encode(response_body).decode()}
+                    await redis.set(storage_key, json.dumps(record), ex=settings.idempotency_ttl)
+                await redis.delete(lock_key)
+            except Exception as err:
+                logger.warning("Can't store idempotent response: %s", err)
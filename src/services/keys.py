@@ -0,0 +1,130 @@
+"""
+JWT signing keys storage.
+Supports a symmetric secret (HS*) or several asymmetric keys (RS*, ES*, PS*, EdDSA) selected by `kid`
+"""
+from pathlib import Path
+from typing import Optional
+
+import jwt
+from jwt.algorithms import get_default_algorithms
+
+from src.config.settings import settings
+
+
+class KeyRing:
+    '''
+    Class that holds parsed JWT keys and picks them by `kid` header.
+    PEM files are parsed only once, on the first use of the key ring
+    '''
+    def __init__(self,
+                 algorithm: str,
+                 secret_key: str,
+                 private_keys: Optional[dict] = None,
+                 public_keys: Optional[dict] = None,
+                 active_kid: Optional[str] = None):
+        """
+        Args:
+            algorithm (str): JWT algorithm, i.e. "HS256", "RS256", "EdDSA"
+            secret_key (str): Shared secret, used with HS* algorithms only
+            private_keys (dict, optional): kid -> path to PEM private key. Keys that may sign tokens.
+            public_keys (dict, optional): kid -> path to PEM public key. Retired keys that are only verified.
+            active_kid (str, optional): kid of the key used for signing. Defaults to the first private key.
+        """
+        self.algorithm    = algorithm
+        self.secret_key   = secret_key
+        self.private_keys = private_keys or {}
+        self.public_keys  = public_keys or {}
+        self.active_kid   = active_kid
+        self._signing     = None
+        self._verifying   = None
+        self._jwks        = None
+
+    @property
+    def symmetric(self) -> bool:
+        """
+        True if tokens are signed with the shared secret
+        """
+        return self.algorithm.startswith("HS")
+
+    def _load(self) -> None:
+        """
+        Parse PEM files into key objects and cache them
+        """
+        if self._verifying is not None:
+            return
+        if self.symmetric:
+            self._signing = (None, self.secret_key)
+            self._verifying = {None: self.secret_key}
+            return
+        alg = get_default_algorithms()[self.algorithm]
+        signing = {kid: alg.prepare_key(Path(path).read_bytes()) for kid, path in self.private_keys.items()}
+        if not signing:
+            raise ValueError(f"No private keys configured for {self.algorithm}")
+        verifying = {kid: alg.prepare_key(Path(path).read_bytes()) for kid, path in self.public_keys.items()}
+        verifying.update({kid: key.public_key() for kid, key in signing.items()})
+        kid = self.active_kid or next(iter(signing))
+        if kid not in signing:
+            raise ValueError(f"Active kid '{kid}' has no private key")
+        self._signing = (kid, signing[kid])
+        self._verifying = verifying
+
+    def encode(self, claims: dict) -> str:
+        """
+        Sign claims with the active key
+
+        Args:
+            claims (dict): Claims for JWT
+
+        Returns:
+            str: Encoded JWT
+        """
+        self._load()
+        kid, key = self._signing
+        headers = {"kid": kid} if kid else None
+        return jwt.encode(claims, key, algorithm=self.algorithm, headers=headers)
+
+    def decode(self, token: str) -> dict:
+        """
+        Verify token with the key selected by its `kid` header
+
+        Args:
+            token (str): Encoded JWT
+
+        Raises:
+            jwt.exceptions.InvalidTokenError: Unknown kid or invalid token
+
+        Returns:
+            dict: Token claims
+        """
+        self._load()
+        kid = jwt.get_unverified_header(token).get("kid") if not self.symmetric else None
+        key = self._verifying.get(kid)
+        if key is None:
+            raise jwt.exceptions.InvalidTokenError(f"Unknown key id: {kid}")
+        return jwt.decode(token, key, algorithms=[self.algorithm])
+
+    def jwks(self) -> dict:
+        """
+        Public keys in JWK Set format. Empty for symmetric algorithms - the secret is never published.
+
+        Returns:
+            dict: JWK Set
+        """
+        if self._jwks is None:
+            self._load()
+            keys = []
+            if not self.symmetric:
+                alg = get_default_algorithms()[self.algorithm]
+                for kid, key in self._verifying.items():
+                    jwk = alg.to_jwk(key, as_dict=True)
+                    jwk.update({"kid": kid, "use": "sig", "alg": self.algorithm})
+                    keys.append(jwk)
+            self._jwks = {"keys": keys}
+        return self._jwks
+
+
+key_ring = KeyRing(algorithm=settings.jwt_algorithm,
+                   secret_key=settings.jwt_secret_key,
+                   private_keys=settings.jwt_private_keys,
+                   public_keys=settings.jwt_public_keys,
+                   active_kid=settings.jwt_active_kid)
@@ -0,0 +1,211 @@
+"""
+Request timing and hot-path instrumentation exposed in Prometheus text format
+"""
+import time
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from src.config.settings import settings
+from src.services.sqldebug import StatementLog
+
+
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+class RequestStats:
+    '''
+    Counters collected while a single request is processed
+    '''
+    def __init__(self, log: Optional[StatementLog] = None):
+        self.db_count = 0
+        self.timings  = {}
+        self.log      = log
+
+    def add(self, kind: str, seconds: float) -> None:
+        """
+        Add time spent in some subsystem
+
+        Args:
+            kind (str): Subsystem name, i.e. "db", "redis", "bcrypt"
+            seconds (float): Time spent
+        """
+        self.timings[kind] = self.timings.get(kind, 0.0) + seconds
+
+
+request_stats: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+class Histogram:
+    '''
+    Cumulative histogram, Prometheus style
+    '''
+    def __init__(self, buckets: tuple):
+        self.buckets = buckets
+        self.counts  = [0] * len(buckets)
+        self.count   = 0
+        self.sum     = 0.0
+
+    def observe(self, value: float) -> None:
+        """
+        Record a value
+
+        Args:
+            value (float): Observed value
+        """
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+
+
+class Registry:
+    '''
+    Storage for histograms keyed by metric name and labels
+    '''
+    def __init__(self):
+        self.lock       = threading.Lock()
+        self.histograms = {}
+        self.help       = {}
+
+    def observe(self, name: str, value: float, buckets: tuple = BUCKETS, **labels) -> None:
+        """
+        Record a value to the histogram
+
+        Args:
+            name (str): Metric name
+            value (float): Observed value
+            buckets (tuple): Histogram bucket bounds. Defaults to BUCKETS.
+            labels: Metric labels
+        """
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def render(self) -> str:
+        """
+        Render all metrics in Prometheus text exposition format
+
+        Returns:
+            str: Metrics
+        """
+        lines = []
+        seen = set()
+        with self.lock:
+            for (name, labels), histogram in sorted(self.histograms.items()):
+                if name not in seen:
+                    seen.add(name)
+                    if name in self.help:
+                        lines.append(f"# HELP {name} {self.help[name]}")
+                    lines.append(f"# TYPE {name} histogram")
+                label_str = ",".join(f'{k}="{v}"' for k, v in labels)
+                prefix = label_str + "," if label_str else ""
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    lines.append(f'{name}_bucket{{{prefix}le="{bound}"}} {count}')
+                lines.append(f'{name}_bucket{{{prefix}le="+Inf"}} {histogram.count}')
+                lines.append(f"{name}_sum{{{label_str}}} {histogram.sum}")
+                lines.append(f"{name}_count{{{label_str}}} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+registry.help.update({
+    "http_request_duration_seconds": "Request latency by route",
+    "http_request_db_queries":       "SQL statements per request",
+    "http_request_db_seconds":       "Time spent in SQL statements per request",
+    "http_request_redis_seconds":    "Time spent in Redis calls per request",
+    "http_request_bcrypt_seconds":   "Time spent hashing passwords per request",
+})
+
+
+@contextmanager
+def timed(kind: str):
+    """
+    Measure time of the block and add it to the current request stats
+
+    Args:
+        kind (str): Subsystem name, i.e. "redis", "bcrypt"
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats = request_stats.get()
+        if stats is not None:
+            stats.add(kind, time.perf_counter() - start)
+
+
+def instrument_engine(engine: Engine) -> None:
+    """
+    Count SQL statements and their time for the current request
+
+    Args:
+        engine (Engine): SQLAlchemy engine
+    """
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_start"].pop()
+        stats = request_stats.get()
+        if stats is not None:
+            stats.db_count += 1
+            stats.add("db", elapsed)
+            if stats.log is not None:
+                stats.log.add(statement, elapsed)
+
+
+class MetricsMiddleware:
+    '''
+    ASGI middleware that records latency and per-request DB, Redis and bcrypt time by route.
+    With SQL debug enabled also logs N+1 and slow statements and adds X-SQL-Statements header.
+    '''
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        stats = RequestStats(StatementLog() if settings.sql_debug else None)
+        token = request_stats.set(stats)
+        status_code = 500
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                if stats.log is not None:
+                    headers = list(message.get("headers", []))
+                    headers.append((b"x-sql-statements", str(len(stats.log)).encode()))
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            request_stats.reset(token)
+            route = scope.get("route")
+            path = getattr(route, "path", "unmatched")
+            method = scope["method"]
+            if stats.log is not None:
+                stats.log.report(f"{method} {path}", settings.sql_statement_budget,
+                                 settings.sql_repeat_threshold, settings.sql_slow_query_ms)
+            registry.observe("http_request_duration_seconds", elapsed,
+                             method=method, route=path, status=status_code)
+            registry.observe("http_request_db_queries", stats.db_count, COUNT_BUCKETS, method=method, route=path)
+            for kind in ("db", "redis", "bcrypt"):
+                registry.observe(f"http_request_{kind}_seconds", stats.timings.get(kind, 0.0),
+                                 method=method, route=path)
@@ -0,0 +1,73 @@
+"""
+Normalization of contact attributes for comparisons: phone numbers in E.164, emails, name keys
+"""
+import unicodedata
+
+import phonenumbers
+
+from src.config.settings import settings
+
+
+def normalize_phone(phone: str, region: str | None = None) -> str | None:
+    """
+    Format phone number as E.164, numbers without country code are parsed for the default region
+
+    Args:
+        phone (str): Phone number as typed
+        region (str, optional): ISO country code. Defaults to `phone_default_region` setting.
+
+    Returns:
+        str | None: E.164 number like +380501234567, None if it is not a possible phone number
+    """
+    try:
+        number = phonenumbers.parse(phone, region or settings.phone_default_region)
+    except phonenumbers.NumberParseException:
+        return None
+    if not phonenumbers.is_possible_number(number):
+        return None
+    return phonenumbers.format_number(number, phonenumbers.PhoneNumberFormat.E164)
+
+
+def normalize_email(email: str) -> str:
+    """
+    Lowercase email without surrounding spaces. "+tag" of the local part is dropped only for
+    providers known to ignore it (`dedup_tag_domains` setting), elsewhere "user+tag" may be another mailbox
+
+    Args:
+        email (str): Email as typed
+
+    Returns:
+        str: normalized email
+    """
+    local, _, domain = email.strip().lower().partition("@")
+    if domain in settings.dedup_tag_domains:
+        local = local.split('+', 1)[0]
+    return f"{local}@{domain}"
+
+
+def normalize_name(name: str) -> str:
+    """
+    Lowercase letters of the name without accents, spaces and punctuation
+
+    Args:
+        name (str): Name as typed
+
+    Returns:
+        str: normalized name
+    """
+    decomposed = unicodedata.normalize("NFKD", name.casefold())
+    return "".join(char for char in decomposed if char.isalpha())
+
+
+def name_key(first_name: str, last_name: str) -> str:
+    """
+    Blocking key of a person's name: last name and first initial, so typos in the rest of the first name meet
+
+    Args:
+        first_name (str): First name
+        last_name (str): Last name
+
+    Returns:
+        str: key
+    """
+    return f"{normalize_name(last_name)}:{normalize_name(first_name)[:1]}"
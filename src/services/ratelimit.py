@@ -0,0 +1,241 @@
+"""
+Rate limiting dependency with per-route and per-user quotas.
+Sliding window counters live in Redis, optional token buckets in the worker memory
+"""
+import time
+
+import jwt
+import redis as pyredis
+from fastapi import Request, Response
+from fastapi_limiter import FastAPILimiter
+
+from src.config.settings import settings
+from src.services.auth import auth_service
+
+
+SLIDING_WINDOW_SCRIPT = """local key = KEYS[1]
+local limit = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local hits = tonumber(ARGV[4])
+
+redis.call('ZREMRANGEBYSCORE', key, 0, now - window)
+local count = redis.call('ZCARD', key)
+if count + hits > limit then
+    local oldest = redis.call('ZRANGE', key, 0, 0, 'WITHSCORES')
+    if oldest[2] then
+        return math.max(1, tonumber(oldest[2]) + window - now)
+    end
+    return window
+end
+for i = 1, hits do
+    redis.call('ZADD', key, now, now .. '-' .. (count + i))
+end
+redis.call('PEXPIRE', key, window)
+return 0"""
+
+
+def parse_quota(quota: str) -> tuple[int, int]:
+    """
+    Parse quota string
+
+    Args:
+        quota (str): Quota in "times/seconds" format, i.e. "10/60"
+
+    Returns:
+        tuple[int, int]: number of requests and window in milliseconds
+    """
+    times, seconds = quota.split("/")
+    return int(times), int(float(seconds) * 1000)
+
+
+class TokenBucket:
+    '''
+    In-process token bucket. Hits are counted locally and pushed to Redis once per sync interval
+    '''
+    def __init__(self, times: int, window: int):
+        """
+        Args:
+            times (int): Bucket capacity
+            window (int): Time in milliseconds to refill the whole bucket
+        """
+        self.capacity     = times
+        self.rate         = times / window
+        self.tokens       = float(times)
+        self.pending      = 0
+        self.updated      = time.monotonic() * 1000
+        self.synced       = self.updated
+        self.blocked_till = 0.0
+
+    def take(self, now: float) -> int:
+        """
+        Take one token from the bucket
+
+        Args:
+            now (float): Current monotonic time in milliseconds
+
+        Returns:
+            int: 0 if the request is allowed, otherwise milliseconds to wait
+        """
+        if now < self.blocked_till:
+            return int(self.blocked_till - now) + 1
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens < 1:
+            return int((1 - self.tokens) / self.rate) + 1
+        self.tokens -= 1
+        self.pending += 1
+        return 0
+
+    def block(self, now: float, pexpire: int) -> None:
+        """
+        Empty the bucket after Redis reported that the shared quota is exhausted
+
+        Args:
+            now (float): Current monotonic time in milliseconds
+            pexpire (int): Milliseconds till the shared window has room again
+        """
+        self.tokens = 0
+        self.blocked_till = now + pexpire
+
+
+class RateLimit:
+    '''
+    FastAPI dependency, sliding window rate limiter.
+    Quota is looked up in settings by "<name>.<endpoint>" first, then by "<name>".
+    Authenticated requests are counted per user, anonymous ones per IP.
+    '''
+    lua_sha   = None
+    lua_redis = None
+
+    def __init__(self, name: str):
+        """
+        Args:
+            name (str): Limiter name, the key for quotas in settings
+        """
+        self.name    = name
+        self.quotas  = {}
+        self.buckets = {}
+
+    def quota(self, endpoint: str, authenticated: bool) -> tuple[int, int]:
+        """
+        Get quota for the endpoint
+
+        Args:
+            endpoint (str): Endpoint function name
+            authenticated (bool): Request has a valid bearer token
+
+        Returns:
+            tuple[int, int]: number of requests and window in milliseconds
+        """
+        cache_key = (endpoint, authenticated)
+        if cache_key not in self.quotas:
+            if authenticated:
+                limits, default = settings.rate_limits_user, settings.rate_limit_user_default
+            else:
+                limits, default = settings.rate_limits, settings.rate_limit_default
+            quota = limits.get(f"{self.name}.{endpoint}") or limits.get(self.name) or default
+            self.quotas[cache_key] = parse_quota(quota)
+        return self.quotas[cache_key]
+
+    @staticmethod
+    def identify(request: Request) -> tuple[str, bool]:
+        """
+        Identify the client by bearer token subject or by IP address.
+        Only the token signature is verified, no DB or cache lookups here.
+
+        Args:
+            request (Request): The request object
+
+        Returns:
+            tuple[str, bool]: client identity and flag if the client is authenticated
+        """
+        scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+        if scheme.lower() == "bearer" and token:
+            try:
+                return f"user:{auth_service.keys.decode(token)['sub']}", True
+            except (jwt.exceptions.PyJWTError, KeyError):
+                pass
+        return f"ip:{RateLimit.client_ip(request)}", False
+
+    @staticmethod
+    def client_ip(request: Request) -> str:
+        """
+        Client IP address. X-Forwarded-For is not read here: any client can send it.
+        uvicorn runs with proxy_headers and resolves it only for trusted proxies (forwarded_allow_ips).
+
+        Args:
+            request (Request): The request object
+
+        Returns:
+            str: IP address
+        """
+        return request.client.host
+
+    async def _check(self, key: str, times: int, window: int, hits: int = 1) -> int:
+        """
+        Run sliding window script in Redis
+
+        Args:
+            key (str): Counter key
+            times (int): Number of requests allowed in the window
+            window (int): Window in milliseconds
+            hits (int): Number of requests to add. Defaults to 1.
+
+        Returns:
+            int: 0 if allowed, otherwise milliseconds till the window has room
+        """
+        redis = FastAPILimiter.redis
+        if RateLimit.lua_redis is not redis:
+            RateLimit.lua_sha = await redis.script_load(SLIDING_WINDOW_SCRIPT)
+            RateLimit.lua_redis = redis
+        args = (str(times), str(window), str(int(time.time() * 1000)), str(hits))
+        try:
+            return await redis.evalsha(RateLimit.lua_sha, 1, key, *args)
+        except pyredis.exceptions.NoScriptError:
+            RateLimit.lua_sha = await redis.script_load(SLIDING_WINDOW_SCRIPT)
+            return await redis.evalsha(RateLimit.lua_sha, 1, key, *args)
+
+    async def _check_local(self, key: str, times: int, window: int) -> int:
+        """
+        Check in-process token bucket, push accumulated hits to Redis once per sync interval
+
+        Args:
+            key (str): Counter key
+            times (int): Number of requests allowed in the window
+            window (int): Window in milliseconds
+
+        Returns:
+            int: 0 if allowed, otherwise milliseconds to wait
+        """
+        now = time.monotonic() * 1000
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            if len(self.buckets) >= settings.rate_limit_local_buckets:
+                # forget clients that have been idle for a full window
+                self.buckets = {k: b for k, b in self.buckets.items() if now - b.updated < window}
+            bucket = self.buckets[key] = TokenBucket(times, window)
+        pexpire = bucket.take(now)
+        if bucket.pending and now - bucket.synced >= settings.rate_limit_sync_seconds * 1000:
+            hits, bucket.pending, bucket.synced = bucket.pending, 0, now
+            shared = await self._check(key, times, window, min(hits, times))
+            if shared != 0:
+                bucket.block(now, shared)
+        return pexpire
+
+    async def __call__(self, request: Request, response: Response):
+        if not settings.rate_limit_enabled:
+            return
+        if not FastAPILimiter.redis:
+            raise Exception("You must call FastAPILimiter.init in startup event of fastapi!")
+        route = request.scope.get("route")
+        endpoint = getattr(route, "name", request.scope["path"])
+        identity, authenticated = self.identify(request)
+        times, window = self.quota(endpoint, authenticated)
+        key = f"{FastAPILimiter.prefix}:{self.name}:{endpoint}:{identity}"
+        if settings.rate_limit_local:
+            pexpire = await self._check_local(key, times, window)
+        else:
+            pexpire = await self._check(key, times, window)
+        if pexpire != 0:
+            return await FastAPILimiter.http_callback(request, response, pexpire)
@@ -0,0 +1,68 @@
+"""
+Redis clients created lazily per worker process
+"""
+import os
+
+import redis
+import redis.asyncio as aioredis
+
+from src.config.settings import settings
+
+
+_sync_client: redis.Redis | None = None
+_async_client: aioredis.Redis | None = None
+
+
+def get_redis() -> redis.Redis:
+    """
+    Get synchronous Redis client (binary values), create its connection pool on the first call
+
+    Returns:
+        redis.Redis: Redis client
+    """
+    global _sync_client
+    if _sync_client is None:
+        pool = redis.ConnectionPool(host=settings.redis_host, port=settings.redis_port, db=0,
+                                    max_connections=settings.redis_max_connections)
+        _sync_client = redis.Redis(connection_pool=pool)
+    return _sync_client
+
+
+def get_async_redis() -> aioredis.Redis:
+    """
+    Get asyncio Redis client (decoded strings), create its connection pool on the first call
+
+    Returns:
+        redis.asyncio.Redis: Redis client
+    """
+    global _async_client
+    if _async_client is None:
+        pool = aioredis.ConnectionPool(host=settings.redis_host, port=settings.redis_port, db=0,
+                                       encoding="utf-8", decode_responses=True,
+                                       max_connections=settings.redis_max_connections)
+        _async_client = aioredis.Redis(connection_pool=pool)
+    return _async_client
+
+
+async def close_redis() -> None:
+    """
+    Close both clients and their connection pools
+    """
+    global _sync_client, _async_client
+    if _async_client is not None:
+        await _async_client.aclose()
+        _async_client = None
+    if _sync_client is not None:
+        _sync_client.close()
+        _sync_client.connection_pool.disconnect()
+        _sync_client = None
+
+
+def _forget_clients_after_fork() -> None:
+    # sockets inherited from the parent process must not be shared with the child
+    global _sync_client, _async_client
+    _sync_client = None
+    _async_client = None
+
+
+os.register_at_fork(after_in_child=_forget_clients_after_fork)
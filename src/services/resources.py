@@ -0,0 +1,179 @@
+"""
+Worker resources registry: opens and warms DB, Redis and SMTP connections on startup,
+runs periodic jobs, reports readiness and drains background tasks before closing everything on shutdown
+"""
+import asyncio
+import functools
+import logging
+import time
+
+import aiosmtplib
+from fastapi_limiter import FastAPILimiter
+from sqlalchemy import text
+from starlette.concurrency import run_in_threadpool
+
+from src.config.settings import settings
+from src.models.db import get_engine, dispose_engine
+from src.services.events import event_hub
+from src.services.redis_pool import get_async_redis, close_redis
+from src.services.users import token_writer
+
+
+logger = logging.getLogger(__name__)
+
+
+class Resources:
+    '''
+    Class that owns connections of the worker process and the background tasks started by requests
+    '''
+    def __init__(self):
+        self.ready       = False
+        self.tasks       = 0
+        self.idle        = asyncio.Event()
+        self.idle.set()
+        self._checked_at = 0.0
+        self._checks     = {}
+        self._jobs       = {}
+        self._running    = []
+
+    async def open(self) -> None:
+        """
+        Open pools and warm them, init rate limiter.
+        The worker starts even if DB or Redis is down, readiness probe reports them until they are back.
+        """
+        try:
+            await run_in_threadpool(self._warm_db)
+        except Exception as err:
+            logger.warning("DB pool warm up failed: %s", err)
+        redis = get_async_redis()
+        try:
+            await asyncio.gather(*(redis.ping() for _ in range(settings.redis_pool_warm)))
+        except Exception as err:
+            logger.warning("Redis pool warm up failed: %s", err)
+        await FastAPILimiter.init(redis)
+        if settings.mail_check_on_startup:
+            await self._check_smtp()
+        self._running = [asyncio.create_task(self._run_periodic(name, interval, func))
+                         for name, (interval, func) in self._jobs.items()]
+        self.ready = True
+
+    def periodic(self, name: str, interval: float, func) -> None:
+        """
+        Register a blocking job to run every `interval` seconds in the thread pool.
+        With several workers the job runs only in one of them per interval (Redis lock).
+
+        Args:
+            name (str): Job name, the lock key
+            interval (float): Seconds between runs
+            func (Callable): Function without arguments
+        """
+        self._jobs[name] = (interval, func)
+
+    async def _run_periodic(self, name: str, interval: float, func) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                if await get_async_redis().set(f"job:{name}", 1, nx=True, ex=max(1, int(interval * 0.9))):
+                    await run_in_threadpool(func)
+            except Exception as err:
+                logger.exception("Periodic job %s failed: %s", name, err)
+
+    @staticmethod
+    def _warm_db() -> None:
+        """
+        Open `db_pool_warm` connections and return them to the pool
+        """
+        engine = get_engine()
+        connections = [engine.connect() for _ in range(settings.db_pool_warm)]
+        for connection in connections:
+            connection.execute(text("SELECT 1"))
+            connection.close()
+
+    @staticmethod
+    async def _check_smtp() -> None:
+        """
+        Connect to SMTP server and log in, so misconfiguration shows on startup and not on the first signup
+        """
+        smtp = aiosmtplib.SMTP(hostname=settings.mail_server, port=settings.mail_port,
+                               use_tls=settings.mail_ssl_tls, start_tls=settings.mail_starttls,
+                               validate_certs=settings.mail_validate_certs, timeout=settings.health_timeout)
+        try:
+            await smtp.connect()
+            if settings.mail_use_credentials:
+                await smtp.login(settings.mail_username, settings.mail_password)
+            await smtp.quit()
+        except aiosmtplib.SMTPException as err:
+            logger.warning("SMTP check failed: %s", err)
+
+    async def check(self) -> dict:
+        """
+        Ping DB and Redis. Results are cached for `health_cache_seconds` to protect them from probes.
+
+        Returns:
+            dict: check name -> True if healthy
+        """
+        now = time.monotonic()
+        if now - self._checked_at < settings.health_cache_seconds:
+            return self._checks
+        checks = {}
+        try:
+            await asyncio.wait_for(run_in_threadpool(self._ping_db), settings.health_timeout)
+            checks["db"] = True
+        except Exception as err:
+            logger.warning("DB health check failed: %s", err)
+            checks["db"] = False
+        try:
+            await asyncio.wait_for(get_async_redis().ping(), settings.health_timeout)
+            checks["redis"] = True
+        except Exception as err:
+            logger.warning("Redis health check failed: %s", err)
+            checks["redis"] = False
+        self._checks, self._checked_at = checks, now
+        return checks
+
+    @staticmethod
+    def _ping_db() -> None:
+        with get_engine().connect() as connection:
+            connection.execute(text("SELECT 1"))
+
+    def tracked(self, func):
+        """
+        Decorator for background task coroutines, so shutdown waits for them
+
+        Args:
+            func (Callable): async function
+
+        Returns:
+            Callable: wrapped function
+        """
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            self.tasks += 1
+            self.idle.clear()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                self.tasks -= 1
+                if self.tasks == 0:
+                    self.idle.set()
+        return wrapper
+
+    async def close(self) -> None:
+        """
+        Stop reporting readiness, wait for background tasks up to `shutdown_timeout`, close pools
+        """
+        self.ready = False
+        for task in self._running:
+            task.cancel()
+        self._running = []
+        try:
+            await asyncio.wait_for(self.idle.wait(), settings.shutdown_timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Shutdown deadline reached, %d background tasks dropped", self.tasks)
+        await event_hub.close()
+        await token_writer.close()
+        await close_redis()
+        dispose_engine()
+
+
+resources = Resources()
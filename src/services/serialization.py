@@ -0,0 +1,53 @@
+"""
+Fast JSON responses for read routes.
+Rows selected from the DB are trusted: models are built with `model_construct` (no validation)
+and dumped to JSON bytes by pydantic-core in one call, FastAPI's response_model validation
+and jsonable_encoder passes are skipped by returning a ready Response.
+"""
+from typing import Iterable, Type
+
+from fastapi import Response
+from pydantic import BaseModel, TypeAdapter
+
+
+_adapters: dict[type, TypeAdapter] = {}
+
+
+def _list_adapter(schema: Type[BaseModel]) -> TypeAdapter:
+    """
+    Cached TypeAdapter of list[schema], building one is expensive
+    """
+    adapter = _adapters.get(schema)
+    if adapter is None:
+        adapter = _adapters[schema] = TypeAdapter(list[schema])
+    return adapter
+
+
+def rows_json(rows: Iterable, schema: Type[BaseModel]) -> bytes:
+    """
+    Serialize rows to a JSON array without validation.
+    Rows may have only some of the schema fields (sparse fieldsets), the missing ones are omitted.
+
+    Args:
+        rows (Iterable): SQLAlchemy rows (column tuples) or mappings with schema field names
+        schema (Type[BaseModel]): Response schema
+
+    Returns:
+        bytes: JSON
+    """
+    items = [schema.model_construct(**(row._mapping if hasattr(row, "_mapping") else row)) for row in rows]
+    return _list_adapter(schema).dump_json(items, exclude_unset=True)
+
+
+def rows_response(rows: Iterable, schema: Type[BaseModel]) -> Response:
+    """
+    JSON response with rows serialized by `rows_json`
+
+    Args:
+        rows (Iterable): SQLAlchemy rows or mappings
+        schema (Type[BaseModel]): Response schema
+
+    Returns:
+        Response: application/json response
+    """
+    return Response(content=rows_json(rows, schema), media_type="application/json")
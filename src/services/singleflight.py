@@ -0,0 +1,49 @@
+"""
+Request coalescing (single flight) for read routes.
+Identical reads arriving while the same one is in flight (devices of one user polling the same query
+after their caches expired) wait for the result of the first one instead of running the same SQL again.
+The leader's blocking DB work and serialization run in the thread pool, the event loop stays free.
+Coalescing is per worker process, results are not kept after the flight lands.
+"""
+import asyncio
+from typing import Any, Callable, Hashable
+
+from starlette.concurrency import run_in_threadpool
+
+from src.config.settings import settings
+
+
+class SingleFlight:
+    '''
+    In-flight calls by key, callers with the same key share one call
+    '''
+    def __init__(self):
+        self.flights: dict[Hashable, asyncio.Future] = {}
+        self.coalesced = 0                      # calls served by another caller's flight
+
+    async def do(self, key: Hashable, func: Callable, *args) -> Any:
+        """
+        Run blocking `func(*args)` in the thread pool, or join the call in flight with the same key
+
+        Args:
+            key (Hashable): Identity of the call, must include everything the result depends on
+                (user, parameters, primary or replica). None - run alone, not coalesced.
+            func (Callable): Blocking function, its result is shared by all callers and must not be mutated
+            *args: Arguments of func
+
+        Returns:
+            Any: func result, its exception is raised to every caller
+        """
+        if key is None or not settings.singleflight_enabled:
+            return await run_in_threadpool(func, *args)
+        flight = self.flights.get(key)
+        if flight is None:
+            flight = self.flights[key] = asyncio.ensure_future(run_in_threadpool(func, *args))
+            flight.add_done_callback(lambda done: self.flights.pop(key) if self.flights.get(key) is done else None)
+        else:
+            self.coalesced += 1
+        # a cancelled caller (client gone) does not cancel the flight of the others
+        return await asyncio.shield(flight)
+
+
+single_flight = SingleFlight()
@@ -0,0 +1,115 @@
+"""
+SQL statements log for development and CI: N+1 (repeated statements) and slow query detection
+"""
+import logging
+import time
+from contextlib import contextmanager
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+logger = logging.getLogger(__name__)
+
+
+class StatementLog:
+    '''
+    Statements executed during a request or a test, with their duration
+    '''
+    def __init__(self):
+        self.statements = []
+
+    def __len__(self) -> int:
+        return len(self.statements)
+
+    def add(self, statement: str, seconds: float) -> None:
+        """
+        Record executed statement
+
+        Args:
+            statement (str): SQL statement with placeholders
+            seconds (float): Execution time
+        """
+        self.statements.append((statement, seconds))
+
+    def repeated(self, threshold: int) -> list[tuple[str, int]]:
+        """
+        Find statements executed several times - usually lazy loading in a loop (N+1)
+
+        Args:
+            threshold (int): Minimal number of executions to report
+
+        Returns:
+            list[tuple[str, int]]: statements and number of executions
+        """
+        counts = {}
+        for statement, _ in self.statements:
+            counts[statement] = counts.get(statement, 0) + 1
+        return [(statement, count) for statement, count in counts.items() if count >= threshold]
+
+    def slow(self, threshold_ms: float) -> list[tuple[str, float]]:
+        """
+        Find statements slower than threshold
+
+        Args:
+            threshold_ms (float): Threshold in milliseconds
+
+        Returns:
+            list[tuple[str, float]]: statements and their time in milliseconds
+        """
+        return [(statement, seconds * 1000) for statement, seconds in self.statements
+                if seconds * 1000 >= threshold_ms]
+
+    def report(self, route: str, budget: int, repeat_threshold: int, slow_ms: float) -> bool:
+        """
+        Log problems found in the statements
+
+        Args:
+            route (str): Route path for the log message
+            budget (int): Max number of statements, 0 - unlimited
+            repeat_threshold (int): Minimal number of executions to report as N+1
+            slow_ms (float): Slow query threshold in milliseconds
+
+        Returns:
+            bool: True if anything was reported
+        """
+        found = False
+        if budget and len(self) > budget:
+            logger.warning("%s: %d SQL statements, budget is %d", route, len(self), budget)
+            found = True
+        for statement, count in self.repeated(repeat_threshold):
+            logger.warning("%s: possible N+1, statement executed %d times: %s", route, count, statement)
+            found = True
+        for statement, ms in self.slow(slow_ms):
+            logger.warning("%s: slow query %.1f ms: %s", route, ms, statement)
+            found = True
+        return found
+
+
+@contextmanager
+def count_statements(engine: Engine):
+    """
+    Collect all statements executed on the engine inside the block.
+    Use in tests to enforce a statement budget for a route.
+
+    Args:
+        engine (Engine): SQLAlchemy engine
+
+    Yields:
+        StatementLog: statements executed so far
+    """
+    log = StatementLog()
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("debug_query_start", []).append(time.perf_counter())
+
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        log.add(statement, time.perf_counter() - conn.info["debug_query_start"].pop())
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", after_cursor_execute)
+    try:
+        yield log
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+        event.remove(engine, "after_cursor_execute", after_cursor_execute)
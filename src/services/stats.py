@@ -0,0 +1,207 @@
+"""
+Per-user contact statistics.
+Counters live in a Redis hash and are changed incrementally on create, update and delete.
+A missing hash is rebuilt from the database, a periodic job reconciles the existing ones.
+Every change also bumps the user's version key: a recount is stored only if no change happened
+while it ran, otherwise it could drop that change or be overwritten with it.
+"""
+import logging
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, extract
+from sqlalchemy.orm import Session
+
+from src.config.settings import settings
+from src.models.db import SessionLocal, get_engine
+from src.models.models import Contact
+from src.services.redis_pool import get_redis
+
+
+logger = logging.getLogger(__name__)
+
+STATS_KEY = "contacts:stats:{}"
+VERSION_KEY = "contacts:stats_version:{}"
+RECONCILE_BATCH = 1000
+
+# KEYS: hash, version; ARGV: version TTL, counter/delta pairs
+# counters are changed only if the hash exists, otherwise it is rebuilt from the DB on the next read
+INCREMENT_SCRIPT = """redis.call('INCR', KEYS[2])
+redis.call('EXPIRE', KEYS[2], ARGV[1])
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    for i = 2, #ARGV, 2 do
+        redis.call('HINCRBY', KEYS[1], ARGV[i], ARGV[i + 1])
+    end
+    return 1
+end
+return 0"""
+
+# KEYS: hash, version; ARGV: version read before the recount, TTL, "absent" or "present", counter/value pairs
+# the recount replaces the hash only if no change was counted meanwhile and the hash is in the expected state
+STORE_SCRIPT = """if (redis.call('GET', KEYS[2]) or '') ~= ARGV[1] then
+    return 0
+end
+if (redis.call('EXISTS', KEYS[1]) == 1) ~= (ARGV[3] == 'present') then
+    return 0
+end
+redis.call('DEL', KEYS[1])
+redis.call('HSET', KEYS[1], unpack(ARGV, 4))
+redis.call('EXPIRE', KEYS[1], ARGV[2])
+return 1"""
+
+
+def _adjust(user_id: int, deltas: dict) -> None:
+    """
+    Change user's counters
+
+    Args:
+        user_id (int): User ID
+        deltas (dict): counter name -> delta
+    """
+    if user_id is None:
+        return
+    args = [value for pair in deltas.items() for value in pair]
+    key = STATS_KEY.format(user_id)
+    try:
+        get_redis().eval(INCREMENT_SCRIPT, 2, key, VERSION_KEY.format(user_id), settings.stats_cache_ttl, *args)
+    except Exception as err:
+        logger.warning("Can't update contact stats of user %s: %s", user_id, err)
+        try:
+            get_redis().delete(key)
+        except Exception:
+            pass
+
+
+def contact_added(contact: Contact) -> None:
+    """
+    Count new contact
+
+    Args:
+        contact (Contact): Created contact
+    """
+    _adjust(contact.user_id, {"total": 1, f"month:{contact.birthday.month}": 1})
+
+
+def contact_removed(contact: Contact) -> None:
+    """
+    Uncount deleted contact
+
+    Args:
+        contact (Contact): Deleted contact
+    """
+    _adjust(contact.user_id, {"total": -1, f"month:{contact.birthday.month}": -1})
+
+
+def birthday_changed(user_id: int, old_month: int, new_month: int) -> None:
+    """
+    Move contact to another birth month
+
+    Args:
+        user_id (int): User ID
+        old_month (int): Previous birth month
+        new_month (int): New birth month
+    """
+    if old_month != new_month:
+        _adjust(user_id, {f"month:{old_month}": -1, f"month:{new_month}": 1})
+
+
+def compute_stats(db: Session, user_ids: list[int] | None = None) -> dict[int, dict]:
+    """
+    Count contacts by user and birth month with one GROUP BY query
+
+    Args:
+        db (Session): Database session
+        user_ids (list[int], optional): Users to count. Defaults to all users with contacts.
+
+    Returns:
+        dict[int, dict]: user ID -> counters hash
+    """
+    month = extract('month', Contact.birthday)
+    query = db.query(Contact.user_id, month, func.count(Contact.id)) \
+              .filter(Contact.deleted_at.is_(None)) \
+              .group_by(Contact.user_id, month)
+    if user_ids is not None:
+        query = query.filter(Contact.user_id.in_(user_ids))
+    stats = {user_id: {"total": 0} for user_id in user_ids or []}
+    for user_id, birth_month, count in query:
+        counters = stats.setdefault(user_id, {"total": 0})
+        counters["total"] += count
+        counters[f"month:{int(birth_month)}"] = count
+    return stats
+
+
+def _store(user_id: int, counters: dict, version: bytes | None, state: str) -> bool:
+    """
+    Write recounted counters hash atomically, unless the counters changed during the recount
+
+    Args:
+        user_id (int): User ID
+        counters (dict): counter name -> value
+        version (bytes | None): User's version key read before the recount
+        state (str): "absent" - create a missing hash, "present" - replace an existing one
+
+    Returns:
+        bool: True if stored
+    """
+    args = [value for pair in counters.items() for value in pair]
+    return bool(get_redis().eval(STORE_SCRIPT, 2, STATS_KEY.format(user_id), VERSION_KEY.format(user_id),
+                                 (version or b"").decode(), settings.stats_cache_ttl, state, *args))
+
+
+async def get_stats(user_id: int, db: Session) -> dict:
+    """
+    Get user's contact statistics
+
+    Args:
+        user_id (int): User ID
+        db (Session): Database session
+
+    Returns:
+        dict: total, counts by birth month and number of contacts added recently
+    """
+    counters = version = None
+    try:
+        pipe = get_redis().pipeline(transaction=False)
+        pipe.hgetall(STATS_KEY.format(user_id))
+        pipe.get(VERSION_KEY.format(user_id))
+        cached, version = pipe.execute()
+        if cached:
+            counters = {key.decode(): int(value) for key, value in cached.items()}
+    except Exception as err:
+        logger.warning("Can't read contact stats of user %s: %s", user_id, err)
+    if counters is None:
+        counters = compute_stats(db, [user_id])[user_id]
+        try:
+            _store(user_id, counters, version, "absent")
+        except Exception as err:
+            logger.warning("Can't cache contact stats of user %s: %s", user_id, err)
+    since = datetime.now() - timedelta(days=settings.stats_recent_days)
+    recent = db.query(func.count(Contact.id)).filter(Contact.user_id == user_id,
+                                                      Contact.created_at >= since,
+                                                      Contact.deleted_at.is_(None)).scalar()
+    return {"total": counters.get("total", 0),
+            "by_birth_month": {month: counters.get(f"month:{month}", 0) for month in range(1, 13)},
+            "recently_added": recent,
+            "recent_days": settings.stats_recent_days}
+
+
+def reconcile_stats() -> int:
+    """
+    Periodic job: recount contacts of users with cached counters and overwrite them,
+    fixing drift from failed Redis writes or direct DB changes.
+    Users whose counters changed during the recount are skipped, expired hashes are not recreated.
+
+    Returns:
+        int: Number of users reconciled
+    """
+    r = get_redis()
+    user_ids = [int(key.decode().rsplit(":", 1)[1]) for key in r.scan_iter(STATS_KEY.format("*"))]
+    reconciled = 0
+    for start in range(0, len(user_ids), RECONCILE_BATCH):
+        batch = user_ids[start:start + RECONCILE_BATCH]
+        versions = r.mget([VERSION_KEY.format(user_id) for user_id in batch])
+        with SessionLocal(bind=get_engine()) as db:
+            stats = compute_stats(db, batch)
+        for user_id, version in zip(batch, versions):
+            # users without contacts anymore get zero counters
+            reconciled += _store(user_id, stats[user_id], version, "present")
+    return reconciled
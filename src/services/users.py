@@ -1,16 +1,33 @@
 
+import asyncio
+import hashlib
+import hmac
+import logging
 from datetime import datetime, timedelta
 from fastapi import Depends
+from sqlalchemy import func, Row, insert, update, bindparam
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from libgravatar import Gravatar
 
+from starlette.concurrency import run_in_threadpool
+
+from src.config.settings import settings
+from src.models.db import SessionLocal, get_engine
 from src.models.models import User
 from src.models.schemas import UserModel
 
 
+logger = logging.getLogger(__name__)
+
+# columns needed to log in and refresh tokens, without loading the whole User
+LOGIN_COLUMNS = (User.id, User.email, User.password, User.confirmed, User.refresh_token)
+
+
 async def get_user_by_email(email: str, db: Session) -> User:
     """
-    Get user object by user's email
+    Get user object by user's email, case-insensitive (uses lower(email) unique index)
 
     Args:
         email (str): User's email
@@ -19,43 +36,165 @@ async def get_user_by_email(email: str, db: Session) -> User:
     Returns:
         User: User object
     """
-    return db.query(User).filter(User.email == email).first()
+    return db.query(User).filter(func.lower(User.email) == email.lower()).first()
+
+def _avatar(email: str) -> str | None:
+    try:
+        return Gravatar(email).get_image()
+    except Exception as err:
+        logger.warning("Can't get Gravatar image: %s", err)
+        return None
 
-async def create_user(body: UserModel, db: Session) -> User:
+async def insert_user(body: UserModel, db: Session) -> Row | None:
     """
-    Create user object and write to DB
-    Includes avatar creation with Gravatar service
+    Create user with a single INSERT ... ON CONFLICT DO NOTHING RETURNING statement:
+    no existence check before it, no race between them and no SELECT after it.
+    Conflicts with the case-insensitive email index mean the account exists.
 
     Args:
-        body (UserModel): User attributes
+        body (UserModel): User attributes, password already hashed
         db (Session): Database session
 
     Returns:
-        User: User object
+        Row | None: id, username, email, created_at and avatar of the new user, None if the account exists
     """
-    avatar = None
+    values = {"username": body.username, "email": body.email.lower(), "password": body.password,
+              "created_at": datetime.now(), "avatar": _avatar(body.email)}
+    returning = (User.id, User.username, User.email, User.created_at, User.avatar)
+    dialect = db.get_bind().dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        module = postgresql if dialect == "postgresql" else sqlite
+        statement = module.insert(User).values(**values).on_conflict_do_nothing().returning(*returning)
+        new_user = db.execute(statement).first()
+        db.commit()
+        return new_user
     try:
-        g = Gravatar(body.email)
-        avatar = g.get_image()
-    except Exception as e:
-        print(e)
-    new_user = User(**body.dict(), created_at=datetime.now(), avatar=avatar)
-    db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+        new_user = db.execute(insert(User).values(**values).returning(*returning)).first()
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        return None
     return new_user
 
-async def update_token(user: User, token: str | None , db: Session) -> None:
+async def get_login(email: str, db: Session) -> Row | None:
+    """
+    Get columns needed for login by user's email, case-insensitive
+
+    Args:
+        email (str): User's email
+        db (Session): Database session
+
+    Returns:
+        Row | None: id, email, password hash, confirmed flag and refresh token hash, None if not found
+    """
+    # confirmed users are found by the small partial index, the full one is read only for failed logins
+    user = db.query(*LOGIN_COLUMNS).filter(func.lower(User.email) == email.lower(), User.confirmed.is_(True)).first()
+    if user is None:
+        user = db.query(*LOGIN_COLUMNS).filter(func.lower(User.email) == email.lower()).first()
+    return user
+
+def hash_token(token: str | None) -> str | None:
+    """
+    Refresh tokens are stored as SHA-256, a leaked users table does not leak usable tokens
+
+    Args:
+        token (str | None): Refresh token
+
+    Returns:
+        str | None: hex digest
+    """
+    return hashlib.sha256(token.encode()).hexdigest() if token else None
+
+def token_matches(token: str, user_id: int, stored: str | None) -> bool:
     """
-    Save user's refresh token to the database
+    Compare refresh token with the stored hash, a rotation waiting in the batch wins over the DB value
 
     Args:
-        user (User): User object
-        token (str): User's refresh token
+        token (str): Refresh token presented by the client
+        user_id (int): User ID
+        stored (str | None): Hash from the DB
+
+    Returns:
+        bool: True if the token is the current one
+    """
+    current = token_writer.pending.get(user_id, stored)
+    return current is not None and hmac.compare_digest(current, hash_token(token))
+
+async def store_token(user_id: int, token: str | None, db: Session) -> None:
+    """
+    Save user's refresh token hash with a single UPDATE by primary key, without loading the user.
+    With `auth_token_batch` rotations are queued and written by the batch writer instead,
+    revocation is written at once and after any batch in flight, so a flush can't bring the token back.
+
+    Args:
+        user_id (int): User ID
+        token (str | None): Refresh token, None to revoke
         db (Session): DB session
     """
-    user.refresh_token = token
-    db.commit()
+    if settings.auth_token_batch and token is not None:
+        token_writer.add(user_id, hash_token(token))
+        return
+    async with token_writer.lock:
+        token_writer.pending.pop(user_id, None)
+        db.execute(update(User).where(User.id == user_id).values(refresh_token=hash_token(token)))
+        db.commit()
+
+class TokenWriter:
+    '''
+    Batches refresh token rotations of the worker into one executemany UPDATE every `auth_token_flush_ms`.
+    Until flushed, rotations are checked from memory by this worker only, so it requires a single worker.
+    Writes hold `lock`: a direct write (revocation) waits for the batch in flight and wins over it.
+    '''
+    def __init__(self):
+        self.pending: dict[int, str] = {}
+        self.lock = asyncio.Lock()
+        self._flusher: asyncio.Task | None = None
+
+    def add(self, user_id: int, token_hash: str) -> None:
+        self.pending[user_id] = token_hash
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self) -> None:
+        await asyncio.sleep(settings.auth_token_flush_ms / 1000)
+        await self.flush()
+
+    async def flush(self) -> None:
+        """
+        Write queued rotations, they stay queued if the write fails
+        """
+        async with self.lock:
+            if not self.pending:
+                return
+            batch = dict(self.pending)
+            try:
+                await run_in_threadpool(self._write, batch)
+            except Exception as err:
+                logger.warning("Can't write %d refresh tokens: %s", len(batch), err)
+                return
+            for user_id, token_hash in batch.items():
+                if self.pending.get(user_id) == token_hash:
+                    del self.pending[user_id]
+
+    @staticmethod
+    def _write(batch: dict[int, str]) -> None:
+        statement = update(User).where(User.id == bindparam("user_id")).values(refresh_token=bindparam("token_hash"))
+        with SessionLocal(bind=get_engine()) as db:
+            db.connection().execute(statement, [{"user_id": user_id, "token_hash": token_hash}
+                                                for user_id, token_hash in batch.items()])
+            db.commit()
+
+    async def close(self) -> None:
+        """
+        Flush on shutdown
+        """
+        if self._flusher is not None:
+            self._flusher.cancel()
+            self._flusher = None
+        await self.flush()
+
+
+token_writer = TokenWriter()
 
 async def confirmed_email(email: str, db: Session) -> None:
     """
@@ -84,4 +223,32 @@ async def update_avatar(email, url: str, db: Session) -> User:
     user = await get_user_by_email(email, db)
     user.avatar = url
     db.commit()
-    return user
\ No newline at end of file
+    return user
+
+
+def purge_unconfirmed() -> int:
+    """
+    Periodic job: delete users who did not confirm their email within `users_unconfirmed_days`,
+    in chunks of `users_purge_batch` rows with a commit after each, so locks stay short.
+    Their email can be used to sign up again.
+
+    Returns:
+        int: Number of users deleted
+    """
+    expired = datetime.now() - timedelta(days=settings.users_unconfirmed_days)
+    removed = 0
+    with SessionLocal(bind=get_engine()) as db:
+        while True:
+            ids = [user_id for (user_id,) in db.query(User.id)
+                   .filter(User.confirmed.isnot(True), User.created_at < expired)
+                   .order_by(User.id).limit(settings.users_purge_batch)]
+            if not ids:
+                break
+            db.query(User).filter(User.id.in_(ids), User.confirmed.isnot(True)).delete(synchronize_session=False)
+            db.commit()
+            removed += len(ids)
+            if len(ids) < settings.users_purge_batch:
+                break
+    if removed:
+        logger.info("Purged %d unconfirmed users", removed)
+    return removed
@@ -9,6 +9,7 @@ from main import app
 from src.models.models import Base
 # from src.models.schemas import UserModel
 from src.models.db import get_db
+from src.services.sqldebug import count_statements
 
 
 SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
@@ -48,6 +49,13 @@ def client(session) -> TestClient:
         yield client
 
 
+@pytest.fixture
+def sql_statements():
+    # SQL statements executed during the test, to enforce statement budgets for routes
+    with count_statements(engine) as log:
+        yield log
+
+
 @pytest.fixture(scope="module")
 def user():
     return {"username": "biakabuka", 
@@ -10,5 +10,24 @@ def test_read_main():
     response = client.get("/")
     assert response.status_code == 200
     assert response.json() == {"message": "GoIT homework #11-13 - REST API via FastAPI"}
+    assert response.headers["cache-control"] == "public, max-age=3600"
+    assert "vary" not in response.headers
 
 
+def test_read_metrics():
+    client.get("/")
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert 'http_request_duration_seconds_count{method="GET",route="/",status="200"}' in response.text
+    assert 'http_request_db_queries_bucket{method="GET",route="/",le="0"}' in response.text
+
+def test_health_live():
+    response = client.get("/health/live")
+    assert response.status_code == 200
+    assert response.json() == {"status": "alive"}
+
+def test_health_ready_before_startup():
+    # lifespan did not run for this client, so resources are not opened
+    response = client.get("/health/ready")
+    assert response.status_code == 503
+    assert response.json()["ready"] is False
@@ -1,3 +1,5 @@
+import uuid
+
 import pytest
 import jwt
 
@@ -5,6 +7,7 @@ from unittest.mock import Mock, MagicMock, AsyncMock, patch
 
 from src.models.models import User
 from src.services.auth import auth_service
+from src.services.redis_pool import get_redis
 
 def fastapi_limiter_monkeypatch(monkeypatch):
     monkeypatch.setattr("fastapi_limiter.FastAPILimiter.redis", AsyncMock())
@@ -55,6 +58,14 @@ def test_login_ok(client, session, user, monkeypatch):
     assert data["token_type"] == "bearer"
     assert "password" not in data
 
+def test_login_email_case_insensitive(client, user, monkeypatch):
+    fastapi_limiter_monkeypatch(monkeypatch)
+    response = client.post(
+        "/auth/login",
+        data={"username": user.get("email").upper(), "password": user.get("password")},
+    )
+    assert response.status_code == 200, response.text
+
 def test_login_fail_user_not_found(client, user, monkeypatch):
     fastapi_limiter_monkeypatch(monkeypatch)
     response = client.post(
@@ -91,13 +102,25 @@ def test_login_user_not_confirmed(client, session, user, monkeypatch):
     assert data['detail'] == "Email not confirmed"
 
 #---- refresh token ----
-# requred user to be authenticated
-# def test_refresh_token_ok(client, session, user, monkeypatch):
-#     fastapi_limiter_monkeypatch(monkeypatch)
-#     response = client.get(
-#         "/auth/refresh",
-#         data={"username": user.get("email"), "password": user.get("password")},
-#     )
+def test_refresh_token_rotation(client, session, monkeypatch):
+    fastapi_limiter_monkeypatch(monkeypatch)
+    # a confirmed user of its own, the shared one stays unconfirmed for the tests below
+    email, password = f"rotation-{uuid.uuid4().hex[:8]}@example.com", "123456789"
+    current_user = User(username="rotation", email=email, password=auth_service.get_password_hash(password),
+                        confirmed=True)
+    session.add(current_user)
+    session.commit()
+    user_id = current_user.id
+    tokens = client.post("/auth/login", data={"username": email, "password": password}).json()
+    # only the hash is stored
+    assert session.query(User.refresh_token).filter(User.id == user_id).scalar() != tokens["refresh_token"]
+
+    response = client.get("/auth/refresh", headers={"Authorization": f"Bearer {tokens['refresh_token']}"})
+    assert response.status_code == 200, response.text
+    assert response.json()["refresh_token"] != tokens["refresh_token"]
+    # the old token was rotated out
+    response = client.get("/auth/refresh", headers={"Authorization": f"Bearer {tokens['refresh_token']}"})
+    assert response.status_code == 401
 
 #---- confirm email ----
 @pytest.fixture
@@ -145,3 +168,39 @@ def test_confirm_email_fail_wrong_token(client, session, user, monkeypatch):
 # def test_request_email_fail_user_not_confirmed(client, session, user, monkeypatch):
 #     fastapi_limiter_monkeypatch(monkeypatch)
 #     ...
+
+@pytest.fixture
+def login_keys(monkeypatch):
+    # counters of this test only, real lockouts in the configured Redis are left alone
+    prefix = f"test:{uuid.uuid4().hex}:login"
+    monkeypatch.setattr("src.services.bruteforce.FAIL_KEY", prefix + ":fail:{}")
+    monkeypatch.setattr("src.services.bruteforce.BLOCK_KEY", prefix + ":block:{}")
+    yield prefix
+    keys = get_redis().keys(prefix + ":*")
+    if keys:
+        get_redis().delete(*keys)
+
+
+def test_login_backoff(client, monkeypatch, login_keys):
+    fastapi_limiter_monkeypatch(monkeypatch)
+    monkeypatch.setattr("src.config.settings.settings.login_free_attempts", 2)
+    credentials = {"username": "brute@example.com", "password": "guess"}
+    for _ in range(3):
+        assert client.post("/auth/login", data=credentials).status_code == 401
+    response = client.post("/auth/login", data=credentials)
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) >= 1
+
+
+def test_login_backoff_spoofed_forwarded_for(client, monkeypatch, login_keys):
+    fastapi_limiter_monkeypatch(monkeypatch)
+    monkeypatch.setattr("src.config.settings.settings.login_ip_free_attempts", 2)
+    # a new fake address every attempt neither resets the counter of the real one nor blames the victim
+    for i in range(3):
+        credentials = {"username": f"spoof{i}@example.com", "password": "guess"}
+        response = client.post("/auth/login", data=credentials, headers={"X-Forwarded-For": f"203.0.113.{i}"})
+        assert response.status_code == 401
+    response = client.post("/auth/login", data={"username": "spoof9@example.com", "password": "guess"},
+                           headers={"X-Forwarded-For": "203.0.113.99"})
+    assert response.status_code == 429
+    assert get_redis().keys(login_keys + ":fail:ip:203.0.113.*") == []
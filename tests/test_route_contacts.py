@@ -0,0 +1,167 @@
+import asyncio
+import uuid
+from datetime import date
+from unittest.mock import AsyncMock
+
+from src.models.models import Contact, User
+from src.services.auth import auth_service
+from src.services.redis_pool import get_redis
+from src.services.stats import STATS_KEY
+
+
+def fastapi_limiter_monkeypatch(monkeypatch):
+    monkeypatch.setattr("fastapi_limiter.FastAPILimiter.redis", AsyncMock())
+    monkeypatch.setattr("fastapi_limiter.FastAPILimiter.identifier", AsyncMock())
+    monkeypatch.setattr("fastapi_limiter.FastAPILimiter.http_callback", AsyncMock())
+
+def test_read_contacts_statement_budget(client, session, monkeypatch, sql_statements):
+    fastapi_limiter_monkeypatch(monkeypatch)
+    owner = User(username="contacts_owner", email="owner@example.com", password="hash", confirmed=True)
+    session.add(owner)
+    session.flush()
+    session.add_all([Contact(first_name=f"Name{i}", last_name="Surname", email=f"contact{i}@example.com",
+                             phone=f"+38050000000{i}", birthday=date(1990, 1, i + 1), notes="", user_id=owner.id)
+                     for i in range(5)])
+    session.commit()
+    token = asyncio.run(auth_service.create_access_token(data={"sub": owner.email}))
+    headers = {"Authorization": f"Bearer {token}"}
+    # the current user is cached after the first request
+    client.get("/api/contacts/", headers=headers)
+    sql_statements.statements.clear()
+
+    response = client.get("/api/contacts/", headers=headers)
+    assert response.status_code == 200, response.text
+    assert len(response.json()) == 5
+    # one SELECT for the page, no lazy loads per row
+    assert len(sql_statements) <= 1, sql_statements.statements
+    assert sql_statements.repeated(2) == []
+
+def test_contacts_stats(client, session, monkeypatch):
+    fastapi_limiter_monkeypatch(monkeypatch)
+    owner = session.query(User).filter(User.email == "owner@example.com").first()
+    get_redis().delete(STATS_KEY.format(owner.id), f"user:{owner.email}")
+    token = asyncio.run(auth_service.create_access_token(data={"sub": owner.email}))
+    headers = {"Authorization": f"Bearer {token}"}
+
+    response = client.get("/api/contacts/stats", headers=headers)
+    assert response.status_code == 200, response.text
+    data = response.json()
+    assert data["total"] == 5
+    assert data["by_birth_month"]["1"] == 5
+    assert data["recently_added"] == 5
+
+    response = client.post("/api/contacts/", headers=headers,
+                           json={"first_name": "New", "last_name": "Contact", "email": "new@example.com",
+                                 "phone": "+380501111111", "birthday": "1990-03-01", "notes": ""})
+    assert response.status_code == 200, response.text
+    # counters are updated incrementally, no recount
+    data = client.get("/api/contacts/stats", headers=headers).json()
+    assert data["total"] == 6
+    assert data["by_birth_month"]["3"] == 1
+
+def test_contacts_changes(client, session, monkeypatch):
+    fastapi_limiter_monkeypatch(monkeypatch)
+    monkeypatch.setattr("src.config.settings.settings.changes_settle_seconds", 0)
+    owner = session.query(User).filter(User.email == "owner@example.com").first()
+    token = asyncio.run(auth_service.create_access_token(data={"sub": owner.email}))
+    headers = {"Authorization": f"Bearer {token}"}
+
+    response = client.get("/api/contacts/changes", headers=headers, params={"limit": 4})
+    assert response.status_code == 200, response.text
+    first = response.json()
+    assert len(first["changes"]) == 4 and first["has_more"]
+    rest = client.get("/api/contacts/changes", headers=headers, params={"since": first["cursor"]}).json()
+    assert len(rest["changes"]) == 2 and not rest["has_more"]
+
+    deleted = first["changes"][0]
+    assert client.delete(f"/api/contacts/{deleted['id']}", headers=headers).status_code == 200
+    assert client.get(f"/api/contacts/{deleted['id']}", headers=headers).status_code == 404
+    delta = client.get("/api/contacts/changes", headers=headers, params={"since": rest["cursor"]}).json()
+    assert [change["id"] for change in delta["changes"]] == [deleted["id"]]
+    assert delta["changes"][0]["deleted_at"] is not None
+    # email and phone of a deleted contact can be reused
+    response = client.post("/api/contacts/", headers=headers,
+                           json={key: deleted[key] for key in ("first_name", "last_name", "email",
+                                                               "phone", "birthday", "notes")})
+    assert response.status_code == 200, response.text
+
+    nothing = client.get("/api/contacts/changes", headers=headers, params={"since": "bad"})
+    assert nothing.status_code == 400
+
+def test_read_contacts_fields(client, session, monkeypatch):
+    fastapi_limiter_monkeypatch(monkeypatch)
+    owner = session.query(User).filter(User.email == "owner@example.com").first()
+    token = asyncio.run(auth_service.create_access_token(data={"sub": owner.email}))
+    headers = {"Authorization": f"Bearer {token}"}
+    response = client.get("/api/contacts/", headers=headers, params={"fields": "summary"})
+    assert response.status_code == 200, response.text
+    assert set(response.json()[0]) == {"id", "first_name", "last_name", "email", "phone"}
+
+    response = client.get("/api/contacts/", headers=headers, params={"fields": "email,birthday"})
+    assert set(response.json()[0]) == {"id", "email", "birthday"}
+
+    response = client.get("/api/contacts/", headers=headers, params={"fields": "email,password"})
+    assert response.status_code == 400
+
+def test_lookup_phone(client, session, monkeypatch):
+    fastapi_limiter_monkeypatch(monkeypatch)
+    owner = session.query(User).filter(User.email == "owner@example.com").first()
+    token = asyncio.run(auth_service.create_access_token(data={"sub": owner.email}))
+    headers = {"Authorization": f"Bearer {token}"}
+    get_redis().delete(*get_redis().keys("contacts:phone:*") or ["none"])
+
+    assert client.get("/api/contacts/lookup", headers=headers, params={"phone": "050 222 33 44"}).status_code == 404
+    response = client.post("/api/contacts/", headers=headers,
+                           json={"first_name": "Caller", "last_name": "Id", "email": "caller@example.com",
+                                 "phone": "+380502223344", "birthday": "1990-04-01", "notes": ""})
+    assert response.status_code == 200, response.text
+    # the cached miss is dropped on create
+    response = client.get("/api/contacts/lookup", headers=headers, params={"phone": "(050) 222-33-44"})
+    assert response.status_code == 200, response.text
+    assert response.json()["first_name"] == "Caller"
+
+def test_create_contact_idempotent(client, session, monkeypatch):
+    fastapi_limiter_monkeypatch(monkeypatch)
+    owner = session.query(User).filter(User.email == "owner@example.com").first()
+    token = asyncio.run(auth_service.create_access_token(data={"sub": owner.email}))
+    headers = {"Authorization": f"Bearer {token}", "Idempotency-Key": uuid.uuid4().hex}
+    body = {"first_name": "Retry", "last_name": "Safe", "email": "retry@example.com",
+            "phone": "+380503334455", "birthday": "1990-05-01", "notes": ""}
+
+    first = client.post("/api/contacts/", headers=headers, json=body)
+    assert first.status_code == 200, first.text
+    retry = client.post("/api/contacts/", headers=headers, json=body)
+    assert retry.status_code == 200
+    assert retry.json() == first.json()
+    assert retry.headers["idempotent-replayed"] == "true"
+    assert session.query(Contact).filter(Contact.email == "retry@example.com").count() == 1
+
+    other = client.post("/api/contacts/", headers=headers, json={**body, "first_name": "Other"})
+    assert other.status_code == 422
+
+def test_read_contact_not_modified(client, session, monkeypatch):
+    fastapi_limiter_monkeypatch(monkeypatch)
+    owner = session.query(User).filter(User.email == "owner@example.com").first()
+    contact_id = session.query(Contact.id).filter(Contact.user_id == owner.id, Contact.deleted_at.is_(None)).first()[0]
+    token = asyncio.run(auth_service.create_access_token(data={"sub": owner.email}))
+    headers = {"Authorization": f"Bearer {token}"}
+
+    response = client.get(f"/api/contacts/{contact_id}", headers=headers)
+    assert response.status_code == 200, response.text
+    assert response.headers["cache-control"] == "private, no-cache"
+    assert response.headers["vary"] == "Authorization"
+    modified = response.headers["last-modified"]
+    response = client.get(f"/api/contacts/{contact_id}", headers={**headers, "If-Modified-Since": modified})
+    assert response.status_code == 304
+    assert response.headers["cache-control"] == "private, no-cache"
+    assert response.content == b""
+
+def test_birthdays(client, session, monkeypatch):
+    fastapi_limiter_monkeypatch(monkeypatch)
+    owner = session.query(User).filter(User.email == "owner@example.com").first()
+    token = asyncio.run(auth_service.create_access_token(data={"sub": owner.email}))
+    headers = {"Authorization": f"Bearer {token}"}
+
+    response = client.get("/api/contacts/query/birtdays", headers=headers, params={"days": 366, "fields": "summary"})
+    assert response.status_code == 200, response.text
+    assert response.json() and all("notes" not in contact for contact in response.json())
@@ -1,11 +1,14 @@
 import unittest
+from datetime import datetime
 from unittest.mock import MagicMock
 
 from sqlalchemy.orm import Session
 
 
 from src.services.auth import auth_service
-from src.models.models import User
+from src.services import contacts
+from src.models.models import User, Contact
+from src.models.schemas import ContactFilter
 
 
 class TestContacts(unittest.IsolatedAsyncioTestCase):
@@ -20,7 +23,38 @@ class TestContacts(unittest.IsolatedAsyncioTestCase):
         ...
     
     async def test_find_contacts(self):
-        ...
+        expected = [Contact(id=1), Contact(id=2)]
+        self.session.query().filter().order_by().limit().all.return_value = expected
+        result = await contacts.find_contacts(ContactFilter(last_name="doe", notes="work"), self.session, self.user)
+        self.assertEqual(result, expected)
+        # the query always carries the owner equality, PostgreSQL prunes partitions by it wherever it stands
+        predicates = [str(p.compile(compile_kwargs={"literal_binds": True}))
+                      for p in self.session.query().filter.call_args.args]
+        self.assertIn("contacts.user_id = 1", predicates)
+
+    async def test_find_contacts_no_criteria(self):
+        result = await contacts.find_contacts(ContactFilter(), self.session, self.user)
+        self.assertIsNone(result)
+
+    async def test_contact_filters_phone(self):
+        predicates = [str(p.compile(compile_kwargs={"literal_binds": True}))
+                      for p in contacts.contact_filters(ContactFilter(phone="+380 (50) 222-33-44"))]
+        self.assertEqual(predicates, ["contacts.phone_e164 = '+380502223344'"])
+
+    async def test_changes_cursor(self):
+        updated_at = datetime(2024, 5, 1, 12, 30, 15, 123456)
+        cursor = contacts.encode_cursor(updated_at, 42)
+        self.assertEqual(contacts.decode_cursor(cursor), (updated_at, 42))
+        with self.assertRaises(ValueError):
+            contacts.decode_cursor("not a cursor")
+
+    async def test_select_columns(self):
+        self.assertEqual(contacts.select_columns(None), contacts.READ_COLUMNS)
+        columns = contacts.select_columns("phone, first_name")
+        self.assertEqual([column.key for column in columns], ["id", "first_name", "phone"])
+        self.assertNotIn("notes", [column.key for column in contacts.select_columns("summary")])
+        with self.assertRaises(ValueError):
+            contacts.select_columns("hash")
 
     async def test_read_contact(self):
         ...
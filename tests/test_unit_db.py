@@ -0,0 +1,55 @@
+import unittest
+from unittest.mock import MagicMock, patch
+
+from src.models.db import ReplicaRouter, get_read_db
+
+
+class TestReplicaRouter(unittest.TestCase):
+    def setUp(self):
+        self.router = ReplicaRouter(["sqlite://", "sqlite://"])
+        self.request = MagicMock()
+        self.request.headers = {"Authorization": "Bearer token"}
+
+    def tearDown(self):
+        self.router.dispose()
+
+    def test_round_robin(self):
+        first, second = self.router.engines()
+        self.assertEqual(self.router.candidates(), [first, second])
+        self.assertEqual(self.router.candidates(), [second, first])
+
+    def test_failover(self):
+        first, second = self.router.engines()
+        self.router.mark_down(first)
+        self.assertEqual(self.router.candidates(), [second])
+        self.assertEqual(self.router.candidates(), [second])
+
+    def test_read_after_write_uses_primary(self):
+        primary = MagicMock()
+        with patch("src.models.db.replicas", self.router), \
+             patch.object(self.router, "wrote_recently", return_value=True):
+            dependency = get_read_db(self.request, primary)
+            self.assertIs(next(dependency), primary)
+
+    def test_replica_session(self):
+        primary = MagicMock()
+        with patch("src.models.db.replicas", self.router), \
+             patch.object(self.router, "wrote_recently", return_value=False):
+            dependency = get_read_db(self.request, primary)
+            session = next(dependency)
+            self.assertIsNot(session, primary)
+            self.assertIn(session.get_bind(), self.router.engines())
+            dependency.close()
+
+    def test_all_replicas_down_uses_primary(self):
+        primary = MagicMock()
+        for engine in self.router.engines():
+            self.router.mark_down(engine)
+        with patch("src.models.db.replicas", self.router), \
+             patch.object(self.router, "wrote_recently", return_value=False):
+            dependency = get_read_db(self.request, primary)
+            self.assertIs(next(dependency), primary)
+
+
+if __name__ == '__main__':
+    unittest.main()
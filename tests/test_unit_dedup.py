@@ -0,0 +1,104 @@
+import unittest
+from datetime import date
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from src.models.models import Base, Contact, User
+from src.services import dedup
+from src.services.normalize import normalize_phone, normalize_email, name_key
+
+
+def row(id, first_name, last_name, email, phone, birthday=date(1990, 1, 1)):
+    return SimpleNamespace(id=id, first_name=first_name, last_name=last_name, email=email, phone=phone,
+                           phone_e164=None, birthday=birthday)
+
+
+class TestNormalize(unittest.TestCase):
+    def test_normalize_phone(self):
+        self.assertEqual(normalize_phone("050 123 45 67"), "+380501234567")
+        self.assertEqual(normalize_phone("+38 (050) 123-45-67"), "+380501234567")
+        self.assertEqual(normalize_phone("(202) 555-0143", "US"), "+12025550143")
+        self.assertIsNone(normalize_phone("call me"))
+
+    def test_normalize_email(self):
+        self.assertEqual(normalize_email(" John.Doe+work@GMail.COM "), "john.doe@gmail.com")
+        # elsewhere "+tag" may be another mailbox
+        self.assertEqual(normalize_email("sales+eu@example.com"), "sales+eu@example.com")
+
+    def test_name_key(self):
+        self.assertEqual(name_key("Robert", "O'Brien"), name_key("Rob", "o brien"))
+
+
+class TestDedup(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.session = MagicMock(spec=Session)
+        self.user = User(id=1)
+
+    def test_find_duplicates(self):
+        rows = [row(1, "Robert", "Smith", "bob@example.com", "+380501234567"),
+                row(2, "Bob", "Smith", "robert@example.com", "050-123-45-67"),
+                row(3, "Robert", "Smith", "smith@example.com", "+380507654321", date(1980, 5, 5)),
+                row(4, "Rob", "Smyth", "BOB@example.com", "+380509999999", date(1970, 2, 2))]
+        pairs = dedup.find_duplicates(rows, 0.6)
+        self.assertEqual(pairs[0]["contact_ids"], [1, 2])
+        self.assertEqual(pairs[0]["reasons"], ["phone", "birthday"])
+        self.assertIn([1, 4], [pair["contact_ids"] for pair in pairs])
+        self.assertNotIn([1, 3], [pair["contact_ids"] for pair in pairs])
+
+    def test_find_duplicates_nickname(self):
+        rows = [row(1, "Robert", "Smith", "bob@example.com", "+380501234567"),
+                row(2, "Bob", "Smith", "robert@example.com", "+380507654321")]
+        self.assertEqual(dedup.find_duplicates(rows, 0)[0]["reasons"], ["birthday"])
+
+    def test_groups(self):
+        pairs = [{"contact_ids": [1, 2]}, {"contact_ids": [2, 5]}, {"contact_ids": [7, 8]}]
+        # 1 and 5 are not paired with each other, 5 stays apart
+        self.assertEqual(dedup._groups(pairs), [[1, 2], [7, 8]])
+        pairs.append({"contact_ids": [1, 5]})
+        self.assertEqual(dedup._groups(pairs), [[1, 2, 5], [7, 8]])
+
+    async def test_merge_contacts(self):
+        keep = Contact(id=1, user_id=1, notes="friend", birthday=date(1990, 1, 1))
+        duplicate = Contact(id=2, user_id=1, notes="work", birthday=date(1990, 1, 1))
+        self.session.query().filter().all.return_value = [keep, duplicate]
+        with patch.object(dedup, "_merged"):
+            result = await dedup.merge_contacts(1, [2], self.session, self.user)
+        self.assertIs(result, keep)
+        self.assertEqual(keep.notes, "friend\nwork")
+        self.assertIsNotNone(duplicate.deleted_at)
+
+    async def test_merge_contacts_not_found(self):
+        self.session.query().filter().all.return_value = [Contact(id=1)]
+        self.assertIsNone(await dedup.merge_contacts(1, [2], self.session, self.user))
+
+    async def test_auto_merge_session_per_user(self):
+        engine = create_engine("sqlite://")
+        Base.metadata.create_all(bind=engine)
+        with Session(engine) as db:
+            db.add_all([User(id=user_id, username=f"u{user_id}", email=f"u{user_id}@example.com", password="hash")
+                        for user_id in (1, 2)])
+            db.add_all([Contact(first_name="John", last_name="Doe", email=f"john{i}@example.com",
+                                phone="+380501234567" if i else "0501234567", birthday=date(1990, 1, 1),
+                                notes="", user_id=user_id)
+                        for user_id in (1, 2) for i in range(2)])
+            db.commit()
+        sessions = []
+        factory = dedup.SessionLocal
+
+        def session_local(**kwargs):
+            sessions.append(factory(**kwargs))
+            return sessions[-1]
+
+        with patch.object(dedup, "get_engine", return_value=engine), \
+             patch.object(dedup, "SessionLocal", side_effect=session_local), \
+             patch.object(dedup, "_merged"):
+            self.assertEqual(dedup.auto_merge(), 2)
+        # the listing session and one per user, loaded contacts are released after each user
+        self.assertEqual(len(sessions), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,43 @@
+import json
+import unittest
+from datetime import date, datetime
+from unittest.mock import MagicMock, patch
+
+from src.models.models import Contact
+from src.services import events
+from src.services.events import EventHub, RESYNC
+
+
+class TestEvents(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.hub = EventHub()
+        self.hub._listener = MagicMock(done=MagicMock(return_value=False))
+
+    async def test_publish(self):
+        contact = Contact(id=7, first_name="John", last_name="Doe", email="john@example.com", phone="+380501234567",
+                          birthday=date(1990, 1, 2), notes="", user_id=3, updated_at=datetime(2024, 1, 1))
+        redis = MagicMock()
+        with patch.object(events, "get_redis", return_value=redis):
+            events.publish("created", contact, "cursor")
+        channel, data = redis.publish.call_args.args
+        self.assertEqual(channel, "contacts:events:3")
+        self.assertEqual(json.loads(data)["contact"]["id"], 7)
+
+    async def test_dispatch_to_user_only(self):
+        async with self.hub.subscribe(1) as mine, self.hub.subscribe(2) as other:
+            self.hub.dispatch("contacts:events:1", json.dumps({"event": "deleted", "cursor": "c"}))
+            self.assertEqual(mine.get_nowait()["event"], "deleted")
+            self.assertTrue(other.empty())
+        self.assertEqual(self.hub.subscribers, {})
+
+    async def test_slow_subscriber_resync(self):
+        with patch.object(events.settings, "events_queue_size", 2):
+            async with self.hub.subscribe(1) as queue:
+                for _ in range(3):
+                    self.hub.dispatch("contacts:events:1", json.dumps({"event": "updated"}))
+                self.assertEqual(queue.get_nowait(), RESYNC)
+                self.assertTrue(queue.empty())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+import unittest
+from unittest.mock import AsyncMock, patch
+
+from src.services.auth import auth_service
+from src.services.idempotency import IdempotencyMiddleware
+
+
+class TestIdempotency(unittest.IsolatedAsyncioTestCase):
+    def scope(self, token: str) -> dict:
+        return {"type": "http", "method": "POST", "path": "/api/contacts/", "query_string": b"",
+                "client": ("10.0.0.1", 50000),
+                "headers": [(b"authorization", f"Bearer {token}".encode()), (b"idempotency-key", b"k1")]}
+
+    async def run_app(self, status: int) -> AsyncMock:
+        async def app(scope, receive, send):
+            await receive()
+            await send({"type": "http.response.start", "status": status, "headers": []})
+            await send({"type": "http.response.body", "body": b"{}"})
+
+        async def receive():
+            return {"type": "http.request", "body": b"{}", "more_body": False}
+
+        redis = AsyncMock()
+        redis.get.return_value = None
+        redis.set.return_value = True
+        token = await auth_service.create_access_token(data={"sub": "example@example.com"})
+        with patch("src.services.idempotency.get_async_redis", return_value=redis):
+            await IdempotencyMiddleware(app)(self.scope(token), receive, AsyncMock())
+        return redis
+
+    def stored(self, redis: AsyncMock) -> bool:
+        return any(not call.args[0].endswith(":lock") for call in redis.set.call_args_list)
+
+    async def test_storage_key_by_subject(self):
+        first = await auth_service.create_access_token(data={"sub": "example@example.com"}, expires_delta=60)
+        refreshed = await auth_service.create_access_token(data={"sub": "example@example.com"}, expires_delta=120)
+        self.assertNotEqual(first, refreshed)
+        self.assertEqual(IdempotencyMiddleware.storage_key(self.scope(first), "k1"),
+                         IdempotencyMiddleware.storage_key(self.scope(refreshed), "k1"))
+        other = await auth_service.create_access_token(data={"sub": "other@example.com"})
+        self.assertNotEqual(IdempotencyMiddleware.storage_key(self.scope(first), "k1"),
+                            IdempotencyMiddleware.storage_key(self.scope(other), "k1"))
+
+    async def test_final_outcomes_stored(self):
+        for status in (200, 201, 400, 409, 422):
+            with self.subTest(status=status):
+                self.assertTrue(self.stored(await self.run_app(status)))
+
+    async def test_retryable_not_stored(self):
+        for status in (401, 403, 408, 425, 429, 500, 503):
+            with self.subTest(status=status):
+                redis = await self.run_app(status)
+                self.assertFalse(self.stored(redis))
+                redis.delete.assert_awaited()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+import jwt
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa, ed25519
+
+from src.services.keys import KeyRing
+
+
+def write_pem(directory, name, private_key, public=False):
+    path = Path(directory) / name
+    if public:
+        data = private_key.public_key().public_bytes(serialization.Encoding.PEM,
+                                                     serialization.PublicFormat.SubjectPublicKeyInfo)
+    else:
+        data = private_key.private_bytes(serialization.Encoding.PEM,
+                                         serialization.PrivateFormat.PKCS8,
+                                         serialization.NoEncryption())
+    path.write_bytes(data)
+    return str(path)
+
+
+class TestKeyRing(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.new_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        self.old_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        self.ring = KeyRing(algorithm="RS256",
+                            secret_key="",
+                            private_keys={"new": write_pem(self.tmp.name, "new.pem", self.new_key)},
+                            public_keys={"old": write_pem(self.tmp.name, "old.pem", self.old_key, public=True)})
+        self.claims = {"sub": "example@example.com"}
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_encode_sets_kid(self):
+        token = self.ring.encode(self.claims)
+        self.assertEqual(jwt.get_unverified_header(token)["kid"], "new")
+        self.assertEqual(self.ring.decode(token), self.claims)
+
+    def test_decode_retired_key(self):
+        token = jwt.encode(self.claims, self.old_key, algorithm="RS256", headers={"kid": "old"})
+        self.assertEqual(self.ring.decode(token), self.claims)
+
+    def test_decode_unknown_kid(self):
+        token = jwt.encode(self.claims, self.old_key, algorithm="RS256", headers={"kid": "unknown"})
+        with self.assertRaises(jwt.exceptions.InvalidTokenError):
+            self.ring.decode(token)
+
+    def test_jwks(self):
+        jwks = self.ring.jwks()
+        self.assertEqual({key["kid"] for key in jwks["keys"]}, {"new", "old"})
+        for key in jwks["keys"]:
+            self.assertEqual(key["kty"], "RSA")
+            self.assertNotIn("d", key)
+
+    def test_eddsa(self):
+        key = ed25519.Ed25519PrivateKey.generate()
+        ring = KeyRing(algorithm="EdDSA", secret_key="",
+                       private_keys={"ed": write_pem(self.tmp.name, "ed.pem", key)})
+        token = ring.encode(self.claims)
+        self.assertEqual(ring.decode(token), self.claims)
+        self.assertEqual(ring.jwks()["keys"][0]["crv"], "Ed25519")
+
+    def test_symmetric(self):
+        ring = KeyRing(algorithm="HS256", secret_key="secret")
+        token = ring.encode(self.claims)
+        self.assertNotIn("kid", jwt.get_unverified_header(token))
+        self.assertEqual(jwt.decode(token, "secret", algorithms=["HS256"]), self.claims)
+        self.assertEqual(ring.jwks(), {"keys": []})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+import unittest
+from unittest.mock import MagicMock
+
+from src.services.auth import auth_service
+from src.services.ratelimit import RateLimit, TokenBucket, parse_quota
+
+
+class TestRateLimit(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.limiter = RateLimit("contacts")
+
+    def request(self, headers=None):
+        request = MagicMock()
+        request.headers = headers or {}
+        request.client.host = "10.0.0.1"
+        return request
+
+    def test_parse_quota(self):
+        self.assertEqual(parse_quota("10/60"), (10, 60000))
+        self.assertEqual(parse_quota("2/0.5"), (2, 500))
+
+    async def test_identify_anonymous(self):
+        self.assertEqual(RateLimit.identify(self.request()), ("ip:10.0.0.1", False))
+
+    async def test_identify_forwarded_ignored(self):
+        # the header is resolved by uvicorn for trusted proxies only, a client can't choose its key
+        request = self.request({"X-Forwarded-For": "1.2.3.4, 10.0.0.1"})
+        self.assertEqual(RateLimit.identify(request), ("ip:10.0.0.1", False))
+
+    async def test_identify_user(self):
+        token = await auth_service.create_access_token(data={"sub": "example@example.com"})
+        request = self.request({"Authorization": f"Bearer {token}"})
+        self.assertEqual(RateLimit.identify(request), ("user:example@example.com", True))
+
+    async def test_identify_invalid_token(self):
+        request = self.request({"Authorization": "Bearer whatever"})
+        self.assertEqual(RateLimit.identify(request), ("ip:10.0.0.1", False))
+
+    def test_token_bucket(self):
+        bucket = TokenBucket(times=2, window=1000)
+        now = bucket.updated
+        self.assertEqual(bucket.take(now), 0)
+        self.assertEqual(bucket.take(now), 0)
+        self.assertGreater(bucket.take(now), 0)
+        self.assertEqual(bucket.take(now + 500), 0)
+        self.assertEqual(bucket.pending, 3)
+
+    def test_token_bucket_block(self):
+        bucket = TokenBucket(times=2, window=1000)
+        now = bucket.updated
+        bucket.block(now, 300)
+        self.assertEqual(bucket.take(now + 100), 201)
+        self.assertEqual(bucket.take(now + 1000), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+import asyncio
+import threading
+import time
+import unittest
+from unittest.mock import MagicMock
+
+from src.routes.contacts import flight_key
+from src.services import contacts
+from src.services.singleflight import SingleFlight
+
+
+class TestSingleFlight(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.flight = SingleFlight()
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def slow(self, value):
+        with self.lock:
+            self.calls += 1
+        time.sleep(0.05)
+        return value
+
+    async def test_coalesce_same_key(self):
+        results = await asyncio.gather(*(self.flight.do(("birthdays", 1), self.slow, b"[]") for _ in range(5)))
+        self.assertEqual(results, [b"[]"] * 5)
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(self.flight.coalesced, 4)
+        self.assertEqual(self.flight.flights, {})
+
+    async def test_different_keys(self):
+        results = await asyncio.gather(self.flight.do(("birthdays", 1), self.slow, 1),
+                                       self.flight.do(("birthdays", 2), self.slow, 2))
+        self.assertEqual(results, [1, 2])
+        self.assertEqual(self.calls, 2)
+
+    async def test_no_key_not_coalesced(self):
+        # clients pinned to the primary after a write read alone
+        await asyncio.gather(*(self.flight.do(None, self.slow, 1) for _ in range(3)))
+        self.assertEqual(self.calls, 3)
+
+    async def test_key_by_database(self):
+        columns = contacts.select_columns("summary")
+        request = MagicMock()
+        request.state.read_from = "replica"
+        replica = flight_key(request, "birthdays", 1, columns, 7, False)
+        request.state.read_from = "primary"
+        self.assertNotEqual(replica, flight_key(request, "birthdays", 1, columns, 7, False))
+        request.state.read_from = "pinned"
+        self.assertIsNone(flight_key(request, "birthdays", 1, columns, 7, False))
+
+    async def test_error_to_all_callers(self):
+        def fail():
+            time.sleep(0.05)
+            raise RuntimeError("db is gone")
+
+        results = await asyncio.gather(self.flight.do("key", fail), self.flight.do("key", fail), return_exceptions=True)
+        self.assertTrue(all(isinstance(result, RuntimeError) for result in results))
+        # the next call runs again
+        self.assertEqual(await self.flight.do("key", self.slow, 3), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+import unittest
+from datetime import date
+from unittest.mock import MagicMock, patch
+
+from sqlalchemy.orm import Session
+
+from src.services import stats
+from src.services.redis_pool import get_redis
+
+
+USER_ID = 900001
+
+
+class TestStats(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.session = MagicMock(spec=Session)
+        self.redis = get_redis()
+        self.keys = (stats.STATS_KEY.format(USER_ID), stats.VERSION_KEY.format(USER_ID))
+        self.redis.delete(*self.keys)
+        self.contact = MagicMock(user_id=USER_ID, birthday=date(1990, 5, 1))
+
+    def tearDown(self):
+        self.redis.delete(*self.keys)
+
+    def counters(self):
+        return {key.decode(): int(value) for key, value in self.redis.hgetall(self.keys[0]).items()}
+
+    async def test_get_stats_rebuilds_missing(self):
+        with patch.object(stats, "compute_stats", return_value={USER_ID: {"total": 2, "month:5": 2}}):
+            result = await stats.get_stats(USER_ID, self.session)
+        self.assertEqual(result["total"], 2)
+        self.assertEqual(self.counters(), {"total": 2, "month:5": 2})
+
+    async def test_get_stats_change_during_rebuild(self):
+        def recount(db, user_ids):
+            # a contact is added while the recount runs
+            stats.contact_added(self.contact)
+            return {USER_ID: {"total": 2}}
+
+        with patch.object(stats, "compute_stats", side_effect=recount):
+            await stats.get_stats(USER_ID, self.session)
+        # the stale recount is not stored, the next read counts again
+        self.assertFalse(self.redis.exists(self.keys[0]))
+
+    async def test_reconcile_existing_only(self):
+        self.redis.hset(self.keys[0], mapping={"total": 7})
+        with patch.object(stats, "compute_stats",
+                          side_effect=lambda db, user_ids: {user_id: {"total": 3} for user_id in user_ids}) as compute, \
+             patch.object(stats, "SessionLocal"), patch.object(stats, "get_engine"):
+            reconciled = stats.reconcile_stats()
+        self.assertIn(USER_ID, compute.call_args.args[1])
+        self.assertGreaterEqual(reconciled, 1)
+        self.assertEqual(self.counters(), {"total": 3})
+
+    async def test_reconcile_skips_changed(self):
+        self.redis.hset(self.keys[0], mapping={"total": 7})
+
+        def recount(db, user_ids):
+            stats.contact_removed(self.contact)
+            return {user_id: {"total": 3} for user_id in user_ids}
+
+        with patch.object(stats, "compute_stats", side_effect=recount), \
+             patch.object(stats, "SessionLocal"), patch.object(stats, "get_engine"):
+            stats.reconcile_stats()
+        # the decrement made during the recount is kept
+        self.assertEqual(self.counters()["total"], 6)
+
+    async def test_reconcile_does_not_recreate(self):
+        with patch.object(stats, "compute_stats",
+                          side_effect=lambda db, user_ids: {user_id: {"total": 0} for user_id in user_ids}) as compute, \
+             patch.object(stats, "SessionLocal"), patch.object(stats, "get_engine"):
+            stats.reconcile_stats()
+        for call in compute.call_args_list:
+            self.assertNotIn(USER_ID, call.args[1])
+        self.assertFalse(self.redis.exists(self.keys[0]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,8 +1,13 @@
+import asyncio
+import time
 import unittest
-from unittest.mock import MagicMock
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock, patch
+from sqlalchemy import create_engine
+from sqlalchemy.dialects import postgresql
 from sqlalchemy.orm import Session
 
-from src.models.models import User
+from src.models.models import Base, User
 from src.models.schemas import UserModel
 import src.services.users as users
 
@@ -30,16 +35,62 @@ class TestUser(unittest.IsolatedAsyncioTestCase):
         result = await users.get_user_by_email(email=self.email, db=self.session)
         self.assertIsNone(result)
 
-    async def test_create_user(self):
-        result = await users.create_user(body=self.body, db=self.session)
-        self.assertEqual(result.username, self.body.username)
-        self.assertEqual(result.email, self.body.email)
-        self.assertEqual(result.password, self.body.password)
-    
-    async def test_update_token(self):
-        self.session.query().filter().first.return_value = self.user
-        await users.update_token(user=self.user, token=self.refresh_token, db=self.session)
-        self.assertIsInstance(self.user.refresh_token, str)
+    async def test_insert_user(self):
+        self.session.get_bind().dialect.name = "postgresql"
+        self.session.execute.return_value.first.return_value = None
+        result = await users.insert_user(body=self.body, db=self.session)
+        self.assertIsNone(result)
+        statement = str(self.session.execute.call_args.args[0].compile(dialect=postgresql.dialect()))
+        self.assertIn("ON CONFLICT DO NOTHING RETURNING", statement)
+
+    async def test_store_token_batched(self):
+        with patch.object(users.settings, "auth_token_batch", True), \
+             patch.object(users.token_writer, "_write") as write:
+            await users.store_token(user_id=1, token=self.refresh_token, db=self.session)
+            self.session.execute.assert_not_called()
+            self.assertTrue(users.token_matches(self.refresh_token, 1, None))
+            await users.token_writer.flush()
+            write.assert_called_once_with({1: users.hash_token(self.refresh_token)})
+        self.assertEqual(users.token_writer.pending, {})
+        self.assertFalse(users.token_matches(self.refresh_token, 1, None))
+
+    async def test_revoke_wins_over_batch_in_flight(self):
+        writes = []
+
+        def slow_write(batch):
+            time.sleep(0.05)
+            writes.append("batch")
+
+        self.session.execute.side_effect = lambda statement: writes.append("revoke")
+        with patch.object(users.settings, "auth_token_batch", True), \
+             patch.object(users.token_writer, "_write", side_effect=slow_write):
+            await users.store_token(user_id=1, token=self.refresh_token, db=self.session)
+            flush = asyncio.create_task(users.token_writer.flush())
+            await asyncio.sleep(0.01)
+            await users.store_token(user_id=1, token=None, db=self.session)
+            await flush
+        self.assertEqual(writes, ["batch", "revoke"])
+        self.assertEqual(users.token_writer.pending, {})
+
+    def test_token_batch_single_worker(self):
+        with self.assertRaises(ValueError):
+            type(users.settings)(auth_token_batch=True, server_workers=2)
+
+    async def test_purge_unconfirmed(self):
+        engine = create_engine("sqlite://")
+        Base.metadata.create_all(bind=engine)
+        old = datetime.now() - timedelta(days=30)
+        with Session(engine) as db:
+            db.add_all([User(username=f"old{i}", email=f"old{i}@example.com", password="hash", created_at=old)
+                        for i in range(5)])
+            db.add_all([User(username="new", email="new@example.com", password="hash", created_at=datetime.now()),
+                        User(username="ok", email="ok@example.com", password="hash", created_at=old, confirmed=True)])
+            db.commit()
+        with patch.object(users, "get_engine", return_value=engine), \
+             patch.object(users.settings, "users_purge_batch", 2):
+            self.assertEqual(users.purge_unconfirmed(), 5)
+        with Session(engine) as db:
+            self.assertEqual(sorted(email for (email,) in db.query(User.email)), ["new@example.com", "ok@example.com"])
 
     async def test_confirmed_email(self):
         user = User(email=self.email)